@@ -9,15 +9,26 @@ import json
 import os
 from datetime import datetime
 from patent_assistant import PatentAssistant
+from patent_store import PatentStore
 from gemini_client import GeminiClient
 import time
-import threading
+
+
+# LLM 调用以网络等待为主，并发上限可远高于CPU核数
+_CPU = os.cpu_count() or 4
+_MAX_WORKERS = max(32, 4 * _CPU)
+
+# 专利列表排序方式：显示名称 -> (排序键函数, 是否倒序)
+_SORTS = {
+    "生成时间(最新)": (lambda p: p.get('generated_at', ''), True),
+    "生成时间(最旧)": (lambda p: p.get('generated_at', ''), False),
+    "标题(A-Z)": (lambda p: p.get('title', ''), False),
+    "状态": (lambda p: p.get('status', ''), False),
+}
 
 
 def init_session_state():
     """初始化会话状态"""
-    if 'patent_assistant' not in st.session_state:
-        st.session_state.patent_assistant = None
     if 'patent_ideas' not in st.session_state:
         st.session_state.patent_ideas = []
     if 'generated_patents' not in st.session_state:
@@ -28,6 +39,21 @@ def init_session_state():
         st.session_state.config = {}
 
 
+@st.cache_resource
+def _test_client(api_key: str, model: str, base_url: str):
+    """按配置缓存连接测试用的客户端"""
+    return GeminiClient(api_key, model, base_url)
+
+
+@st.cache_data(ttl=30)
+def _probe(api_key: str, model: str, base_url: str):
+    """发送连接测试请求，相同配置 30 秒内复用结果"""
+    return _test_client(api_key, model, base_url).generate_content(
+        "请回复'连接成功'",
+        temperature=0.1
+    )
+
+
 def setup_sidebar():
     """设置侧边栏配置"""
     st.sidebar.title("⚙️ 系统配置")
@@ -35,7 +61,7 @@ def setup_sidebar():
     # 模型厂商选择
     st.sidebar.subheader("🤖 模型配置")
     
-    # 获取预定义厂商
+    # 获取预定义厂商（模块级只读常量，无需缓存）
     providers = GeminiClient.get_predefined_providers()
     provider_names = list(providers.keys())
     
@@ -100,8 +126,8 @@ def setup_sidebar():
     max_workers_ideas = st.sidebar.slider(
         "创意生成线程数",
         min_value=1,
-        max_value=10,
-        value=3,
+        max_value=_MAX_WORKERS,
+        value=16,
         help="同时生成专利创意的线程数量",
         key="ideas_workers_slider"
     )
@@ -109,12 +135,21 @@ def setup_sidebar():
     max_workers_patents = st.sidebar.slider(
         "专利生成线程数",
         min_value=1,
-        max_value=10,
-        value=2,
+        max_value=_MAX_WORKERS,
+        value=16,
         help="同时生成完整专利的线程数量",
         key="patents_workers_slider"
     )
     
+    rate_limit = st.sidebar.number_input(
+        "每秒请求数上限",
+        min_value=1,
+        max_value=100,
+        value=10,
+        help="批量生成时每秒最多发出的API请求数，应不高于厂商的速率限制",
+        key="rate_limit_input"
+    )
+    
     # 生成参数
     st.sidebar.subheader("🎛️ 生成参数")
     
@@ -142,11 +177,7 @@ def setup_sidebar():
     if st.sidebar.button("🔗 测试连接", key="test_connection_btn"):
         if api_key and model and base_url:
             try:
-                test_client = GeminiClient(api_key, model, base_url)
-                test_result = test_client.generate_content(
-                    "请回复'连接成功'",
-                    temperature=0.1
-                )
+                test_result = _probe(api_key, model, base_url)
                 if "连接成功" in test_result or "成功" in test_result:
                     st.sidebar.success("✅ 连接成功！")
                 else:
@@ -163,54 +194,103 @@ def setup_sidebar():
         'provider': selected_provider,
         'max_workers_ideas': max_workers_ideas,
         'max_workers_patents': max_workers_patents,
+        'rate_limit': rate_limit,
         'temperature': temperature,
         'patent_temperature': patent_temperature
     }
     
-    # 保存配置到会话状态
-    st.session_state.config = config
+    # 仅在配置变化时写回会话状态
+    if st.session_state.get('config') != config:
+        st.session_state.config = config
     return config
 
 
+@st.cache_resource
+def _get_store(data_file: str = "patents_data.json"):
+    """每个数据文件只创建一个专利存储，所有模型的助手共享，避免互相覆盖日志和快照"""
+    # 界面上连续生成、编辑时合并写入，进程退出前自动落盘
+    return PatentStore(data_file, save_mode="batched")
+
+
+@st.cache_resource
+def _get_assistant(api_key: str, model: str, base_url: str):
+    """按 (api_key, model, base_url) 缓存专利助手实例，跨会话共享；只有客户端随模型切换"""
+    return PatentAssistant(
+        api_key=api_key,
+        model=model,
+        base_url=base_url,
+        store=_get_store()
+    )
+
+
 def create_patent_assistant(config):
     """创建或获取专利助手实例"""
-    if config['api_key'] and config['model']:
-        try:
-            # 检查是否已有实例且配置相同
-            if ('patent_assistant' in st.session_state and 
-                st.session_state.patent_assistant is not None and
-                hasattr(st.session_state, 'assistant_config') and
-                st.session_state.assistant_config == config):
-                return st.session_state.patent_assistant
-            
-            # 创建新的专利助手实例
-            assistant = PatentAssistant(
-                api_key=config['api_key'],
-                model=config['model'],
-                base_url=config['base_url']
-            )
-            
-            # 保存到会话状态
-            st.session_state.patent_assistant = assistant
-            st.session_state.assistant_config = config.copy()
-            
-            return assistant
-        except Exception as e:
-            st.error(f"创建专利助手失败：{str(e)}")
-            return None
-    return None
+    if not (config['api_key'] and config['model']):
+        return None
+    
+    # 只有影响客户端的三项配置参与比较，温度等按调用传入的参数不会触发重建
+    key = (config.get('api_key'), config.get('model'), config.get('base_url'))
+    if st.session_state.get('assistant_key') == key:
+        return st.session_state.assistant
+    
+    try:
+        assistant = _get_assistant(*key)
+    except Exception as e:
+        st.error(f"创建专利助手失败：{str(e)}")
+        return None
+    
+    st.session_state.assistant_key = key
+    st.session_state.assistant = assistant
+    return assistant
+
+
+# 旧版本号的导出内容不会再被命中，只保留少量条目
+@st.cache_data(max_entries=4, hash_funcs={PatentAssistant: id})
+def _export_json(assistant, revision):
+    """按助手的专利数据版本号缓存 JSON 导出内容，各会话共享同一版本号"""
+    return assistant.export_patents_json()
+
 
+# 旧版本号的导出内容不会再被命中，只保留少量条目
+@st.cache_data(max_entries=4, hash_funcs={PatentAssistant: id})
+def _export_text(assistant, revision):
+    """按助手的专利数据版本号缓存文本导出内容，各会话共享同一版本号"""
+    return assistant.export_patents_text()
 
-def tab_generate_ideas():
+
+def _now_tag():
+    """导出文件名使用的时间标记"""
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+@st.cache_data
+def _idea_options(titles):
+    """根据创意标题元组生成选项列表，失败的创意以 None 占位以保留原始序号"""
+    return [f"{i+1}. {title}" for i, title in enumerate(titles) if title is not None]
+
+
+def _stream_patent(assistant, title, features, temperature):
+    """流式生成专利并实时渲染，完成后保存并返回专利文档"""
+    placeholder = st.empty()
+    buf = []
+    for chunk in assistant.stream_full_patent(
+        title=title,
+        features=features,
+        temperature=temperature
+    ):
+        buf.append(chunk)
+        placeholder.markdown("".join(buf))
+    
+    # 完整内容会在下方的专利文档区域展示
+    placeholder.empty()
+    patent = assistant.add_patent(title, features, "".join(buf))
+    return patent
+
+
+def tab_generate_ideas(assistant, config):
     """专利创意生成标签页"""
     st.header("💡 生成专利创意")
     
-    config = st.session_state.config
-    
-    if not config.get('api_key'):
-        st.warning("⚠️ 请在侧边栏配置API密钥")
-        return
-    
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -229,107 +309,105 @@ def tab_generate_ideas():
         generate_btn = st.button("🚀 开始生成", type="primary", key="generate_ideas_btn")
     
     if generate_btn:
-        # 显示配置信息用于调试
-        st.write("🔧 当前配置:")
-        st.write(f"- API密钥: {'已配置' if config.get('api_key') else '未配置'}")
-        st.write(f"- 模型: {config.get('model', '未配置')}")
-        st.write(f"- 基础URL: {config.get('base_url', '未配置')}")
-        st.write(f"- 线程数: {config.get('max_workers_ideas', '未配置')}")
-        st.write(f"- 温度: {config.get('temperature', '未配置')}")
+        # 显示配置信息用于调试（API密钥不明文显示）
+        st.json({
+            "api_key": "已配置" if config.get('api_key') else "未配置",
+            "model": config.get('model'),
+            "base_url": config.get('base_url'),
+            "max_workers_ideas": config.get('max_workers_ideas'),
+            "temperature": config.get('temperature')
+        }, expanded=False)
         
-        assistant = create_patent_assistant(config)
-        if assistant:
-            try:
-                with st.spinner("🔄 正在生成专利创意..."):
-                    # 显示进度条
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    start_time = time.time()
-                    
-                    # 生成专利创意
-                    ideas = assistant.generate_patent_ideas(
-                        count=count,
-                        temperature=config.get('temperature', 0.8),
-                        max_workers=config.get('max_workers_ideas', 3)
-                    )
-                    
-                    end_time = time.time()
-                    progress_bar.progress(100)
-                    
-                    st.session_state.patent_ideas = ideas
+        try:
+            with st.spinner("🔄 正在生成专利创意..."):
+                # 显示进度条
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                start_time = time.time()
+                
+                # 生成专利创意
+                ideas = assistant.generate_patent_ideas(
+                    count=count,
+                    temperature=config.get('temperature', 0.8),
+                    max_workers=config.get('max_workers_ideas', 3),
+                    rate_limit=config.get('rate_limit')
+                )
+                
+                end_time = time.time()
+                progress_bar.progress(100)
+                
+                st.session_state.patent_ideas = ideas
+                
+                # 显示结果统计
+                success_count = sum(1 for idea in ideas if "error" not in idea)
+                error_count = count - success_count
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("总数量", count)
+                with col2:
+                    st.metric("成功", success_count)
+                with col3:
+                    st.metric("失败", error_count)
+                with col4:
+                    st.metric("耗时", f"{end_time - start_time:.1f}秒")
                     
-                    # 显示结果统计
-                    success_count = len([idea for idea in ideas if "error" not in idea])
-                    error_count = count - success_count
+                # 显示详细结果
+                if success_count > 0:
+                    st.success(f"✅ 成功生成 {success_count} 个专利创意！")
+                if error_count > 0:
+                    st.warning(f"⚠️ {error_count} 个创意生成失败")
                     
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("总数量", count)
-                    with col2:
-                        st.metric("成功", success_count)
-                    with col3:
-                        st.metric("失败", error_count)
-                    with col4:
-                        st.metric("耗时", f"{end_time - start_time:.1f}秒")
-                        
-                    # 显示详细结果
-                    if success_count > 0:
-                        st.success(f"✅ 成功生成 {success_count} 个专利创意！")
-                    if error_count > 0:
-                        st.warning(f"⚠️ {error_count} 个创意生成失败")
-                        
-            except Exception as e:
-                st.error(f"❌ 生成过程中出现错误: {str(e)}")
-                import traceback
-                st.code(traceback.format_exc())
-        else:
-            st.error("❌ 无法创建专利助手，请检查配置")
+        except Exception as e:
+            st.error(f"❌ 生成过程中出现错误: {str(e)}")
+            import traceback
+            st.code(traceback.format_exc())
     
     # 显示生成的创意
     if st.session_state.patent_ideas:
-        st.subheader("📋 生成的专利创意")
-        
-        for i, idea in enumerate(st.session_state.patent_ideas):
-            with st.expander(f"💡 创意 {i+1}: {idea.get('title', '未知标题')}"):
-                if "error" in idea:
-                    st.error(f"生成失败：{idea['error']}")
-                else:
-                    col1, col2 = st.columns([3, 1])
+        _ideas_list_fragment()
+
+
+@st.fragment
+def _ideas_list_fragment():
+    """生成的创意列表，组件交互只重跑本片段"""
+    st.subheader("📋 生成的专利创意")
+    
+    for i, idea in enumerate(st.session_state.patent_ideas):
+        with st.expander(f"💡 创意 {i+1}: {idea.get('title', '未知标题')}"):
+            if "error" in idea:
+                st.error(f"生成失败：{idea['error']}")
+            else:
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    st.write(f"**技术领域：** {idea.get('field', '未知')}")
                     
-                    with col1:
-                        st.write(f"**技术领域：** {idea.get('field', '未知')}")
-                        
-                        st.write("**核心特性：**")
-                        for feature in idea.get('features', []):
-                            st.write(f"• {feature}")
-                        
-                        if 'innovation_points' in idea:
-                            st.write("**创新点：**")
-                            for point in idea['innovation_points']:
-                                st.write(f"• {point}")
-                        
-                        if 'application_scenarios' in idea:
-                            st.write("**应用场景：**")
-                            for scenario in idea['application_scenarios']:
-                                st.write(f"• {scenario}")
+                    st.write("**核心特性：**")
+                    for feature in idea.get('features', []):
+                        st.write(f"• {feature}")
+                    
+                    if 'innovation_points' in idea:
+                        st.write("**创新点：**")
+                        for point in idea['innovation_points']:
+                            st.write(f"• {point}")
                     
-                    with col2:
-                        if st.button(f"生成专利 {i+1}", key=f"gen_patent_{i}"):
-                            st.session_state.selected_idea = idea
-                            st.rerun()
+                    if 'application_scenarios' in idea:
+                        st.write("**应用场景：**")
+                        for scenario in idea['application_scenarios']:
+                            st.write(f"• {scenario}")
+                
+                with col2:
+                    if st.button(f"生成专利 {i+1}", key=f"gen_patent_{i}"):
+                        st.session_state.selected_idea = idea
+                        st.rerun()
 
 
-def tab_generate_patent():
+def tab_generate_patent(assistant, config):
     """完整专利生成标签页"""
     st.header("📄 生成完整专利")
     
-    config = st.session_state.config
-    
-    if not config.get('api_key'):
-        st.warning("⚠️ 请在侧边栏配置API密钥")
-        return
-    
     # 选择生成方式
     generation_mode = st.radio(
         "选择生成方式",
@@ -344,9 +422,10 @@ def tab_generate_patent():
             return
         
         # 选择创意
-        idea_options = [f"{i+1}. {idea.get('title', '未知标题')}" 
-                       for i, idea in enumerate(st.session_state.patent_ideas)
-                       if "error" not in idea]
+        idea_options = _idea_options(tuple(
+            None if "error" in idea else idea.get('title', '未知标题')
+            for idea in st.session_state.patent_ideas
+        ))
         
         if not idea_options:
             st.warning("⚠️ 没有可用的专利创意")
@@ -357,72 +436,66 @@ def tab_generate_patent():
         selected_idea = st.session_state.patent_ideas[selected_index]
         
         if st.button("🚀 生成完整专利", type="primary", key="generate_single_patent_btn"):
-            assistant = create_patent_assistant(config)
-            if assistant:
-                try:
-                    with st.spinner("📝 正在生成完整专利文档..."):
-                        start_time = time.time()
-                        
-                        patent = assistant.generate_full_patent(
-                            title=selected_idea['title'],
-                            features=selected_idea['features'],
-                            temperature=config.get('patent_temperature', 0.7)
-                        )
-                        
-                        end_time = time.time()
-                        
-                        st.session_state.current_patent = patent
+            try:
+                with st.spinner("📝 正在生成完整专利文档..."):
+                    start_time = time.time()
+                    
+                    patent = _stream_patent(
+                        assistant,
+                        title=selected_idea['title'],
+                        features=selected_idea['features'],
+                        temperature=config.get('patent_temperature', 0.7)
+                    )
+                    
+                    end_time = time.time()
+                    
+                    st.session_state.current_patent = patent
+                    
+                    if patent['status'] == 'draft':
+                        st.success(f"✅ 专利生成完成！耗时 {end_time - start_time:.1f} 秒")
+                    else:
+                        st.error(f"❌ 专利生成失败: {patent['content'][:200]}...")
                         
-                        if patent['status'] == 'draft':
-                            st.success(f"✅ 专利生成完成！耗时 {end_time - start_time:.1f} 秒")
-                        else:
-                            st.error(f"❌ 专利生成失败: {patent['content'][:200]}...")
-                            
-                except Exception as e:
-                    st.error(f"❌ 生成过程中出现错误: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
-            else:
-                st.error("❌ 无法创建专利助手，请检查配置")
+            except Exception as e:
+                st.error(f"❌ 生成过程中出现错误: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
     
     elif generation_mode == "手动输入":
         title = st.text_input("专利标题", placeholder="输入专利标题", key="manual_title_input")
         
-        st.write("**核心特性：**")
-        features = []
-        for i in range(5):
-            feature = st.text_input(f"特性 {i+1}", key=f"manual_feature_{i}", placeholder=f"输入核心特性 {i+1}")
-            if feature:
-                features.append(feature)
+        raw_features = st.text_area(
+            "核心特性 (每行一条)",
+            placeholder="每行输入一个核心特性",
+            key="manual_features_area"
+        )
+        features = [line.strip() for line in raw_features.splitlines() if line.strip()]
         
         if st.button("🚀 生成完整专利", type="primary", key="generate_manual_patent_btn") and title and features:
-            assistant = create_patent_assistant(config)
-            if assistant:
-                try:
-                    with st.spinner("📝 正在生成完整专利文档..."):
-                        start_time = time.time()
-                        
-                        patent = assistant.generate_full_patent(
-                            title=title,
-                            features=features,
-                            temperature=config.get('patent_temperature', 0.7)
-                        )
-                        
-                        end_time = time.time()
-                        
-                        st.session_state.current_patent = patent
+            try:
+                with st.spinner("📝 正在生成完整专利文档..."):
+                    start_time = time.time()
+                    
+                    patent = _stream_patent(
+                        assistant,
+                        title=title,
+                        features=features,
+                        temperature=config.get('patent_temperature', 0.7)
+                    )
+                    
+                    end_time = time.time()
+                    
+                    st.session_state.current_patent = patent
+                    
+                    if patent['status'] == 'draft':
+                        st.success(f"✅ 专利生成完成！耗时 {end_time - start_time:.1f} 秒")
+                    else:
+                        st.error(f"❌ 专利生成失败: {patent['content'][:200]}...")
                         
-                        if patent['status'] == 'draft':
-                            st.success(f"✅ 专利生成完成！耗时 {end_time - start_time:.1f} 秒")
-                        else:
-                            st.error(f"❌ 专利生成失败: {patent['content'][:200]}...")
-                            
-                except Exception as e:
-                    st.error(f"❌ 生成过程中出现错误: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
-            else:
-                st.error("❌ 无法创建专利助手，请检查配置")
+            except Exception as e:
+                st.error(f"❌ 生成过程中出现错误: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
     
     elif generation_mode == "批量生成":
         if not st.session_state.patent_ideas:
@@ -438,38 +511,47 @@ def tab_generate_patent():
         st.write(f"发现 {len(valid_ideas)} 个可用的专利创意")
         
         if st.button("🚀 批量生成所有专利", type="primary", key="generate_batch_patents_btn"):
-            assistant = create_patent_assistant(config)
-            if assistant:
-                with st.spinner("📝 正在批量生成专利文档..."):
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    start_time = time.time()
-                    
-                    patents = assistant.batch_generate_patents(
-                        patent_ideas=valid_ideas,
-                        temperature=config['patent_temperature'],
-                        max_workers=config['max_workers_patents']
-                    )
-                    
-                    end_time = time.time()
-                    progress_bar.progress(100)
-                    
-                    st.session_state.generated_patents = patents
-                    
-                    # 显示结果统计
-                    success_count = len([p for p in patents if p.get('status') == 'draft'])
-                    error_count = len(patents) - success_count
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("总数量", len(patents))
-                    with col2:
-                        st.metric("成功", success_count)
-                    with col3:
-                        st.metric("失败", error_count)
-                    with col4:
-                        st.metric("耗时", f"{end_time - start_time:.1f}秒")
+            with st.spinner("📝 正在批量生成专利文档..."):
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                start_time = time.time()
+                
+                # asyncio 引擎按完成顺序回调，实时更新进度
+                finished = 0
+                
+                def on_result(index, patent):
+                    nonlocal finished
+                    finished += 1
+                    progress_bar.progress(finished / len(valid_ideas))
+                    status_text.text(f"已完成 {finished}/{len(valid_ideas)}：{patent['title']}")
+                
+                patents = assistant.batch_generate_patents(
+                    patent_ideas=valid_ideas,
+                    temperature=config['patent_temperature'],
+                    max_workers=config['max_workers_patents'],
+                    rate_limit=config.get('rate_limit'),
+                    on_result=on_result
+                )
+                
+                end_time = time.time()
+                progress_bar.progress(100)
+                
+                st.session_state.generated_patents = patents
+                
+                # 显示结果统计
+                success_count = sum(1 for p in patents if p.get('status') == 'draft')
+                error_count = len(patents) - success_count
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("总数量", len(patents))
+                with col2:
+                    st.metric("成功", success_count)
+                with col3:
+                    st.metric("失败", error_count)
+                with col4:
+                    st.metric("耗时", f"{end_time - start_time:.1f}秒")
     
     # 显示当前专利
     if st.session_state.current_patent:
@@ -487,12 +569,8 @@ def tab_generate_patent():
         
         # 显示专利内容
         with st.expander("📖 查看完整内容", expanded=True):
-            st.text_area(
-                "专利内容",
-                value=patent['content'],
-                height=400,
-                key="patent_content_display"
-            )
+            with st.container(border=True, height=400):
+                st.markdown(patent['content'])
         
         # 操作按钮
         col1, col2, col3 = st.columns(3)
@@ -523,64 +601,18 @@ def tab_generate_patent():
                 st.rerun()
 
 
-def tab_manage_patents():
-    """专利管理标签页"""
-    st.header("📚 管理专利")
-    
-    config = st.session_state.config
-    assistant = create_patent_assistant(config) if config.get('api_key') else None
-    
-    if not assistant:
-        st.warning("⚠️ 请在侧边栏配置API密钥")
-        return
-    
-    # 获取所有专利
-    all_patents = assistant.get_patents()
-    
-    if not all_patents:
-        st.info("暂无专利文档，请先生成一些专利")
-        
-        # 显示数据文件信息
-        if hasattr(assistant, 'data_file'):
-            st.write(f"💾 数据文件: {assistant.data_file}")
-            if os.path.exists(assistant.data_file):
-                st.write("✅ 数据文件存在")
-            else:
-                st.write("❌ 数据文件不存在")
-        return
-    
-    # 显示统计信息
-    stats = assistant.get_statistics()
-    col1, col2, col3, col4, col5 = st.columns(5)
-    with col1:
-        st.metric("总专利数", stats['total_patents'])
-    with col2:
-        st.metric("草稿", stats['draft_patents'])
-    with col3:
-        st.metric("错误", stats['error_patents'])
-    with col4:
-        st.metric("成功率", f"{stats['success_rate']:.1f}%")
-    with col5:
-        if hasattr(assistant, 'data_file'):
-            file_size = os.path.getsize(assistant.data_file) if os.path.exists(assistant.data_file) else 0
-            st.metric("数据文件", f"{file_size/1024:.1f}KB")
-    
+@st.fragment
+def _patents_list_fragment(assistant, all_patents):
+    """专利列表，排序和单条操作只重跑本片段"""
     # 专利列表
     st.subheader("📋 专利列表")
     
     # 添加排序选项
-    sort_options = ["生成时间(最新)", "生成时间(最旧)", "标题(A-Z)", "状态"]
-    sort_by = st.selectbox("排序方式", sort_options, key="patent_sort_select")
+    sort_by = st.selectbox("排序方式", list(_SORTS), key="patent_sort_select")
     
     # 排序专利列表
-    if sort_by == "生成时间(最新)":
-        all_patents = sorted(all_patents, key=lambda x: x.get('generated_at', ''), reverse=True)
-    elif sort_by == "生成时间(最旧)":
-        all_patents = sorted(all_patents, key=lambda x: x.get('generated_at', ''))
-    elif sort_by == "标题(A-Z)":
-        all_patents = sorted(all_patents, key=lambda x: x.get('title', ''))
-    elif sort_by == "状态":
-        all_patents = sorted(all_patents, key=lambda x: x.get('status', ''))
+    key_fn, reverse = _SORTS[sort_by]
+    all_patents = sorted(all_patents, key=key_fn, reverse=reverse)
     
     for i, patent in enumerate(all_patents):
         with st.expander(f"📄 {patent['title']} ({patent['id']}) - {patent.get('status', 'unknown')}"):
@@ -601,12 +633,8 @@ def tab_manage_patents():
                 
                 # 显示内容预览
                 content_preview = patent['content'][:300] + "..." if len(patent['content']) > 300 else patent['content']
-                st.text_area(
-                    "内容预览",
-                    value=content_preview,
-                    height=150,
-                    key=f"preview_{patent['id']}_{i}"
-                )
+                with st.container(border=True, height=150):
+                    st.markdown(content_preview)
             
             with col2:
                 st.write("**操作**")
@@ -625,32 +653,68 @@ def tab_manage_patents():
                         st.rerun()
                     else:
                         st.error("❌ 删除失败")
+
+
+def tab_manage_patents(assistant, config):
+    """专利管理标签页"""
+    st.header("📚 管理专利")
+    
+    # 获取所有专利
+    all_patents = assistant.get_patents()
+    
+    # 每次重跑只 stat 一次数据文件（快照和操作日志）
+    file_exists, file_size = assistant.storage_stat()
+    
+    if not all_patents:
+        st.info("暂无专利文档，请先生成一些专利")
+        
+        # 显示数据文件信息
+        if hasattr(assistant, 'data_file'):
+            st.write(f"💾 数据文件: {assistant.data_file}（操作日志: {assistant.log_file}）")
+            if file_exists:
+                st.write("✅ 数据文件存在")
+            else:
+                st.write("❌ 数据文件不存在")
+        return
+    
+    # 显示统计信息
+    stats = assistant.get_statistics()
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("总专利数", stats['total_patents'])
+    with col2:
+        st.metric("草稿", stats['draft_patents'])
+    with col3:
+        st.metric("错误", stats['error_patents'])
+    with col4:
+        st.metric("成功率", f"{stats['success_rate']:.1f}%")
+    with col5:
+        if hasattr(assistant, 'data_file'):
+            st.metric("数据文件", f"{file_size/1024:.1f}KB")
+    
+    _patents_list_fragment(assistant, all_patents)
     
     # 批量操作
     st.subheader("📦 批量操作")
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📥 导出所有专利(JSON)", key="export_all_json_btn"):
-            json_data = assistant.export_patents_json()
-            st.download_button(
-                label="下载JSON文件",
-                data=json_data,
-                file_name=f"patents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json",
-                key="download_all_json_btn"
-            )
+        st.download_button(
+            label="📥 导出所有专利(JSON)",
+            data=_export_json(assistant, assistant.revision),
+            file_name=f"patents_{_now_tag()}.json",
+            mime="application/json",
+            key="download_all_json_btn"
+        )
     
     with col2:
-        if st.button("📥 导出所有专利(文本)", key="export_all_text_btn"):
-            text_data = assistant.export_patents_text()
-            st.download_button(
-                label="下载文本文件",
-                data=text_data,
-                file_name=f"patents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                mime="text/plain",
-                key="download_all_text_btn"
-            )
+        st.download_button(
+            label="📥 导出所有专利(文本)",
+            data=_export_text(assistant, assistant.revision),
+            file_name=f"patents_{_now_tag()}.txt",
+            mime="text/plain",
+            key="download_all_text_btn"
+        )
     
     with col3:
         if st.button("🔄 刷新数据", key="refresh_patents_btn"):
@@ -660,16 +724,10 @@ def tab_manage_patents():
             st.rerun()
 
 
-def tab_optimize_patent():
+def tab_optimize_patent(assistant, config):
     """专利优化标签页"""
     st.header("🔧 优化专利")
     
-    config = st.session_state.config
-    
-    if not config.get('api_key'):
-        st.warning("⚠️ 请在侧边栏配置API密钥")
-        return
-    
     # 选择要优化的专利
     if 'optimize_patent' in st.session_state and st.session_state.optimize_patent:
         patent = st.session_state.optimize_patent
@@ -702,70 +760,68 @@ def tab_optimize_patent():
     )
     
     if st.button("🚀 开始优化", type="primary", key="start_optimize_btn"):
-        assistant = create_patent_assistant(config)
-        if assistant:
-            with st.spinner("🔧 正在优化专利内容..."):
-                start_time = time.time()
-                
-                optimized_content = assistant.optimize_patent(
-                    patent_content=patent['content'],
-                    optimization_focus=optimization_focus,
-                    temperature=0.6
+        with st.spinner("🔧 正在优化专利内容..."):
+            start_time = time.time()
+            
+            optimized_content = assistant.optimize_patent(
+                patent_content=patent['content'],
+                optimization_focus=optimization_focus,
+                temperature=0.6
+            )
+            
+            end_time = time.time()
+            
+            st.success(f"✅ 优化完成！耗时 {end_time - start_time:.1f} 秒")
+            
+            # 显示优化结果
+            st.subheader("📄 优化结果")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.write("**原始内容：**")
+                with st.container(border=True, height=400):
+                    st.markdown(patent['content'])
+            
+            with col2:
+                st.write("**优化后内容：**")
+                with st.container(border=True, height=400):
+                    st.markdown(optimized_content)
+            
+            # 导出按钮
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="📥 下载优化后的专利",
+                    data=optimized_content,
+                    file_name=f"{patent['title']}_优化版.txt",
+                    mime="text/plain",
+                    key="download_optimized_btn"
                 )
-                
-                end_time = time.time()
-                
-                st.success(f"✅ 优化完成！耗时 {end_time - start_time:.1f} 秒")
-                
-                # 显示优化结果
-                st.subheader("📄 优化结果")
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.write("**原始内容：**")
-                    st.text_area(
-                        "原始专利",
-                        value=patent['content'],
-                        height=400,
-                        key="original_content"
-                    )
-                
-                with col2:
-                    st.write("**优化后内容：**")
-                    st.text_area(
-                        "优化专利",
-                        value=optimized_content,
-                        height=400,
-                        key="optimized_content"
-                    )
-                
-                # 导出按钮
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        label="📥 下载优化后的专利",
-                        data=optimized_content,
-                        file_name=f"{patent['title']}_优化版.txt",
-                        mime="text/plain",
-                        key="download_optimized_btn"
-                    )
-                
-                with col2:
-                    # 保存优化后的专利
-                    if st.button("💾 保存为新专利", key="save_optimized_btn"):
-                        if assistant:
-                            optimized_patent = {
-                                "id": f"patent_opt_{int(time.time())}",
-                                "title": f"{patent['title']} (优化版)",
-                                "content": optimized_content,
-                                "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "status": "optimized",
-                                "original_id": patent.get('id', 'unknown')
-                            }
-                            
-                            # 这里需要添加保存逻辑
-                            st.success("✅ 已保存优化后的专利")
+            
+            with col2:
+                # 保存优化后的专利
+                if st.button("💾 保存为新专利", key="save_optimized_btn"):
+                    if assistant:
+                        optimized_patent = {
+                            "id": f"patent_opt_{int(time.time())}",
+                            "title": f"{patent['title']} (优化版)",
+                            "content": optimized_content,
+                            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "status": "optimized",
+                            "original_id": patent.get('id', 'unknown')
+                        }
+                        
+                        # 这里需要添加保存逻辑
+                        st.success("✅ 已保存优化后的专利")
+
+
+_PAGES = {
+    "💡 生成专利创意": tab_generate_ideas,
+    "📄 生成完整专利": tab_generate_patent,
+    "📚 管理专利": tab_manage_patents,
+    "🔧 优化专利": tab_optimize_patent,
+}
 
 
 def main():
@@ -783,29 +839,28 @@ def main():
     # 设置侧边栏配置（只在主函数中调用一次）
     config = setup_sidebar()
     
+    # 每次重跑只获取一次专利助手，传给当前页面
+    assistant = create_patent_assistant(config)
+    
     # 主标题
     st.title("📄 专利撰写助手")
     st.markdown("---")
     
-    # 创建标签页
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "💡 生成专利创意",
-        "📄 生成完整专利", 
-        "📚 管理专利",
-        "🔧 优化专利"
-    ])
-    
-    with tab1:
-        tab_generate_ideas()
-    
-    with tab2:
-        tab_generate_patent()
-    
-    with tab3:
-        tab_manage_patents()
+    # 页面选择：只执行当前页面的函数（st.tabs 会在每次重跑时执行全部页面）
+    page = st.radio(
+        "页面",
+        list(_PAGES),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="page_radio"
+    )
     
-    with tab4:
-        tab_optimize_patent()
+    if not config.get('api_key'):
+        st.warning("⚠️ 请在侧边栏配置API密钥")
+    elif assistant is None:
+        st.error("❌ 无法创建专利助手，请检查配置")
+    else:
+        _PAGES[page](assistant, config)
     
     # 页脚
     st.markdown("---")
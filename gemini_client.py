@@ -3,20 +3,583 @@ Gemini API 客户端封装
 提供简洁的 API 调用接口，支持自定义模型厂商
 """
 
-from openai import OpenAI
+from openai import (
+    OpenAI, AsyncOpenAI, DEFAULT_TIMEOUT,
+    RateLimitError, APITimeoutError, APIConnectionError, InternalServerError, BadRequestError
+)
+import httpx
 import os
 import time
-from typing import Optional, List, Dict, Any
+import random
+import asyncio
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+import copy
 import json
-import concurrent.futures
+import re
+import hashlib
 import threading
-from functools import partial
+import weakref
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, lru_cache
+from types import MappingProxyType
+
+from llm_cache import LLMCache
+
+try:
+    import numpy as np
+except ImportError:  # 仅语义缓存需要 numpy
+    np = None
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+try:
+    import jsonschema
+except ImportError:  # 未安装时跳过客户端侧的 schema 校验
+    jsonschema = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop 仅支持 Linux/macOS，缺失时使用标准事件循环
+    uvloop = None
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+# 连接池配置：批量请求时复用保持连接，避免每个请求重新握手
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+# 长专利生成可能持续数分钟，沿用 SDK 的总超时，仅缩短建连超时
+_HTTP_TIMEOUT = httpx.Timeout(DEFAULT_TIMEOUT.read, connect=5.0)
+
+# 匹配模型输出中第一个 ``` 或 ```json 代码块
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+# 厂商原生 JSON 模式
+_JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+# 已编译的 JSON Schema 校验器，按 id(schema) 缓存并持有 schema 防止 id 被复用
+_schema_validators: Dict[int, tuple] = {}
+_schema_validators_lock = threading.Lock()
+
+
+def _schema_validator(schema: Dict[str, Any]):
+    """获取（并缓存）schema 对应的校验器，未安装 jsonschema 时返回 None"""
+    if jsonschema is None:
+        return None
+    entry = _schema_validators.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        validator_cls = jsonschema.validators.validator_for(schema)
+        entry = (schema, validator_cls(schema))
+        with _schema_validators_lock:
+            _schema_validators[id(schema)] = entry
+    return entry[1]
+
+
+# 重试退避参数：min(上限, 基数 * 2^attempt) + 随机抖动
+_BACKOFF_BASE = 1.0
+_BACKOFF_CAP = 60.0
+_BACKOFF_JITTER = 1.0
+
+# 可重试的临时错误：限流、超时、网络连接失败与 5xx
+_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+_shared_clients: Dict[tuple, OpenAI] = {}
+_shared_clients_lock = threading.Lock()
+
+# 由本模块创建的 SDK 客户端 -> 其底层 httpx 客户端，供直接发送预序列化请求体使用
+_raw_http_clients = weakref.WeakKeyDictionary()
+
+# 直接发送请求体时支持的请求参数，其余参数（流式、输出格式等）仍走 SDK
+_RAW_POST_KEYS = frozenset({"model", "messages", "temperature", "max_tokens"})
+_USER_PLACEHOLDER = "\x00user\x00"
+
+
+def _new_openai_client(api_key: str, base_url: str, limits: Optional[httpx.Limits] = None) -> OpenAI:
+    """创建同步客户端，并登记其 httpx 客户端"""
+    http_client = httpx.Client(
+        limits=limits or httpx.Limits(),
+        timeout=_HTTP_TIMEOUT,
+        http2=_HTTP2_AVAILABLE
+    )
+    client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+    _raw_http_clients[client] = http_client
+    return client
+
+
+def _shared_openai_client(api_key: str, base_url: str) -> OpenAI:
+    """按 (api_key, base_url) 获取进程内共享的同步客户端及其连接池"""
+    key = (api_key, base_url)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _new_openai_client(api_key, base_url, _HTTP_LIMITS)
+            _shared_clients[key] = client
+        return client
+
+
+@lru_cache(maxsize=64)
+def _system_message(content: str) -> Dict[str, str]:
+    """按内容缓存系统消息字典，批量请求共用同一对象（SDK 只读取不修改消息）"""
+    return {"role": "system", "content": content}
+
+
+def _raw_http_client(client) -> Optional[httpx.Client]:
+    """查找本模块创建的 SDK 客户端对应的 httpx 客户端，其他来源的客户端返回 None"""
+    try:
+        return _raw_http_clients.get(client)
+    except TypeError:  # 外部传入的对象不一定支持弱引用
+        return None
+
+
+@lru_cache(maxsize=64)
+def _request_template(model: str, system_prompt: str, temperature: float, max_tokens: Optional[int]) -> tuple:
+    """
+    预先序列化除用户提示外的请求体
+    
+    同一批请求的模型、系统提示和温度相同，之后每次只需序列化用户提示并拼接。
+    
+    Returns:
+        (用户提示之前的字节串, 用户提示之后的字节串)
+    """
+    body = {"model": model, "temperature": temperature}
+    if max_tokens:
+        body["max_tokens"] = max_tokens
+    # messages 放在最后，用户提示占位符之后只剩结尾括号
+    body["messages"] = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _USER_PLACEHOLDER}
+    ]
+    head, _, tail = orjson.dumps(body).rpartition(orjson.dumps(_USER_PLACEHOLDER))
+    return head, tail
+
+
+def _raw_response_content(response: httpx.Response, client) -> Optional[str]:
+    """
+    解析直接请求的响应
+    
+    非 200 响应由 SDK 客户端转换为对应的异常类型（如 BadRequestError、RateLimitError），
+    沿用重试逻辑且不重复发送；只有 200 响应无法解析时返回 None，由调用方改用 SDK 重新请求。
+    """
+    if response.status_code != 200:
+        raise client._make_status_error_from_response(response)
+    try:
+        message = orjson.loads(response.content)["choices"][0]["message"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    return message.get("content") or ""
+
+
+def _rejects_response_format(error: Exception) -> bool:
+    """
+    判断错误是否为厂商拒绝 response_format 参数
+    
+    只有 400 错误的 param、code 或消息提到输出格式时才算；上下文超长、内容过滤、
+    模型不存在等其他 400 错误按普通错误处理，不影响之后请求的输出格式。
+    """
+    if not isinstance(error, BadRequestError):
+        return False
+    body = error.body if isinstance(error.body, dict) else {}
+    text = " ".join(
+        str(part) for part in (body.get("param"), body.get("code"), body.get("message"), error.message) if part
+    ).lower()
+    return any(name in text for name in ("response_format", "json_schema", "json_object"))
+
+
+# 事件循环 -> 关闭该循环中创建的异步客户端的协程函数列表
+_loop_cleanups = weakref.WeakKeyDictionary()
+_loop_cleanups_lock = threading.Lock()
+
+
+async def _run_and_close_clients(coro):
+    """运行协程，结束后关闭本事件循环中创建的异步客户端，释放连接"""
+    try:
+        return await coro
+    finally:
+        with _loop_cleanups_lock:
+            cleanups = _loop_cleanups.pop(asyncio.get_running_loop(), [])
+        for cleanup in cleanups:
+            await cleanup()
+
+
+def run_async(coro):
+    """
+    在新事件循环中运行协程直到完成
+    
+    安装了 uvloop 时使用 uvloop 事件循环，高并发下调度开销更低；
+    只影响本次运行，不修改全局事件循环策略。
+    事件循环结束前关闭其中创建的异步客户端，连接池不会随每次调用累积。
+    """
+    if uvloop is not None and hasattr(uvloop, "run"):
+        return uvloop.run(_run_and_close_clients(coro))
+    return asyncio.run(_run_and_close_clients(coro))
+
+
+# 工作线程私有的同步客户端，由 init_worker_thread 在线程池线程中启用
+_worker_local = threading.local()
+
+
+def init_worker_thread():
+    """
+    线程池 initializer：让当前线程使用私有的同步客户端
+    
+    共享客户端的连接池在高并发线程下会争用同一把锁，
+    批量工作线程各自持有客户端后取连接不再互相阻塞；线程退出时随之释放。
+    """
+    _worker_local.clients = {}
+
+
+def _worker_openai_client(api_key: str, base_url: str) -> Optional[OpenAI]:
+    """返回当前工作线程的私有客户端，非工作线程返回 None"""
+    clients = getattr(_worker_local, "clients", None)
+    if clients is None:
+        return None
+    key = (api_key, base_url)
+    client = clients.get(key)
+    if client is None:
+        client = _new_openai_client(api_key, base_url)
+        clients[key] = client
+    return client
+
+
+def close_shared_clients():
+    """关闭所有共享的同步客户端连接池"""
+    with _shared_clients_lock:
+        for client in _shared_clients.values():
+            client.close()
+        _shared_clients.clear()
+
+
+class RateLimiter:
+    """令牌桶限流器，线程安全，同时支持同步和异步等待"""
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        初始化限流器
+        
+        Args:
+            rate: 每秒补充的令牌数，即每秒请求数上限
+            burst: 令牌桶容量，默认与 rate 相同（至少为1）
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: float = 1) -> float:
+        """预定令牌，返回调用方需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self, tokens: float = 1):
+        """阻塞直到获得令牌"""
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            time.sleep(wait_time)
+    
+    async def aacquire(self, tokens: float = 1):
+        """异步等待直到获得令牌"""
+        wait_time = self.reserve(tokens)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class AdaptiveConcurrency:
+    """AIMD 并发控制：遇到限流时并发上限减半，持续无限流后按周期翻倍恢复"""
+    
+    def __init__(self, ceiling: int = 1024, grow_interval: float = 30.0, shrink_cooldown: float = 1.0):
+        """
+        初始化并发控制器
+        
+        Args:
+            ceiling: 并发上限的最大值，实际并发仍受批量调用的 max_workers 限制
+            grow_interval: 无限流持续多少秒后并发上限翻倍
+            shrink_cooldown: 同一波限流内只减半一次的冷却时间（秒）
+        """
+        self.ceiling = ceiling
+        self.grow_interval = grow_interval
+        self.shrink_cooldown = shrink_cooldown
+        self.poll_interval = 0.05
+        self._limit = ceiling
+        self._in_flight = 0
+        self._last_change = time.monotonic()
+        self._last_shrink = float("-inf")
+        self._lock = threading.Lock()
+    
+    def _current_limit(self) -> int:
+        """返回当前并发上限，按经过的周期惰性恢复（调用方需持有锁）"""
+        now = time.monotonic()
+        if self._limit < self.ceiling and now - self._last_change >= self.grow_interval:
+            periods = int((now - self._last_change) // self.grow_interval)
+            self._limit = min(self.ceiling, self._limit << min(periods, 16))
+            self._last_change = now
+        return self._limit
+    
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        with self._lock:
+            return self._current_limit()
+    
+    def try_acquire(self) -> bool:
+        """尝试占用一个并发槽位"""
+        with self._lock:
+            if self._in_flight < self._current_limit():
+                self._in_flight += 1
+                return True
+            return False
+    
+    def acquire(self):
+        """阻塞直到占用一个并发槽位"""
+        while not self.try_acquire():
+            time.sleep(self.poll_interval)
+    
+    async def aacquire(self):
+        """异步等待直到占用一个并发槽位"""
+        while not self.try_acquire():
+            await asyncio.sleep(self.poll_interval)
+    
+    def release(self):
+        """释放并发槽位"""
+        with self._lock:
+            self._in_flight -= 1
+    
+    def shrink(self):
+        """收到限流响应时调用，将并发上限减半"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_shrink < self.shrink_cooldown:
+                return
+            # 按实际并发量减半（+1 计入刚失败并已释放槽位的请求）
+            self._limit = max(1, min(self._limit, self._in_flight + 1) // 2)
+            self._last_shrink = self._last_change = now
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """从异常携带的 HTTP 响应中读取 Retry-After 秒数"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if value is not None:
+            return max(0.0, float(value))
+    except ValueError:  # HTTP 日期格式，退回默认退避
+        pass
+    return None
+
+
+class _ResponseCache:
+    """线程安全的 LRU + TTL 内存缓存，保存确定性请求的响应内容"""
+    
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        """
+        初始化缓存
+        
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目有效期（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (过期时间, 内容)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+    
+    def set(self, key: str, value: str):
+        """写入缓存"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存和命中统计"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计信息"""
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SemanticCache:
+    """基于向量余弦相似度的语义缓存，措辞不同但语义相同的提示也能命中"""
+    
+    def __init__(self, threshold: float = 0.92, maxsize: int = 10000):
+        """
+        初始化语义缓存
+        
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            maxsize: 最大条目数，写满后循环覆盖最早的条目
+        """
+        if np is None:
+            raise ImportError("语义缓存需要安装 numpy")
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._embeddings = None  # (容量, 维度) 的 float32 矩阵，行向量已归一化
+        self._responses: List[str] = []
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(vector) -> "np.ndarray":
+        """转换为 L2 归一化的 float32 向量"""
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+    
+    def lookup(self, vec: "np.ndarray") -> Optional[str]:
+        """返回相似度达到阈值的最近邻响应，没有则返回 None"""
+        with self._lock:
+            size = len(self._responses)
+            if size == 0 or self._embeddings.shape[1] != vec.shape[0]:
+                return None
+            scores = self._embeddings[:size] @ vec
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                return self._responses[best]
+            return None
+    
+    def add(self, vec: "np.ndarray", response: str):
+        """写入一条 (向量, 响应)"""
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != vec.shape[0]:
+                self._embeddings = np.empty((min(64, self.maxsize), vec.shape[0]), dtype=np.float32)
+                self._responses = []
+                self._next = 0
+            
+            size = len(self._responses)
+            if size < self.maxsize:
+                # 容量不足时按倍数扩展，避免每次写入都复制整个矩阵
+                if size == self._embeddings.shape[0]:
+                    grown = np.empty((min(size * 2, self.maxsize), vec.shape[0]), dtype=np.float32)
+                    grown[:size] = self._embeddings
+                    self._embeddings = grown
+                self._embeddings[size] = vec
+                self._responses.append(response)
+            else:
+                self._embeddings[self._next] = vec
+                self._responses[self._next] = response
+                self._next = (self._next + 1) % self.maxsize
+
+
+# 预定义的模型厂商配置，导入时构建一次；只读视图防止调用方意外修改
+_PROVIDERS = MappingProxyType({
+    "Google Gemini": MappingProxyType({
+        "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
+        "models": (
+            "gemini-2.0-flash-exp",
+            "gemini-2.5-flash-preview-05-20",
+            "gemini-2.5-pro-preview-05-06"
+        )
+    }),
+    "OpenAI": MappingProxyType({
+        "base_url": "https://api.openai.com/v1/",
+        "models": (
+            "gpt-4o",
+            "gpt-4o-mini",
+            "gpt-4-turbo",
+            "gpt-3.5-turbo"
+        )
+    }),
+    "Anthropic Claude": MappingProxyType({
+        "base_url": "https://api.anthropic.com/v1/",
+        "models": (
+            "claude-3-5-sonnet-20241022",
+            "claude-3-5-haiku-20241022",
+            "claude-3-opus-20240229"
+        )
+    }),
+    "DeepSeek": MappingProxyType({
+        "base_url": "https://api.deepseek.com/v1/",
+        "models": (
+            "deepseek-chat",
+            "deepseek-coder"
+        )
+    }),
+    "智谱AI": MappingProxyType({
+        "base_url": "https://open.bigmodel.cn/api/paas/v4/",
+        "models": (
+            "glm-4-plus",
+            "glm-4-0520",
+            "glm-4"
+        )
+    }),
+    "自定义": MappingProxyType({
+        "base_url": "",
+        "models": ()
+    })
+})
 
 
 class GeminiClient:
     """Gemini API 客户端封装类，支持多厂商和多线程"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp", base_url: str = None):
+    # 温度为 0 的请求结果是确定的，所有实例共享一份响应缓存
+    _response_cache = _ResponseCache()
+    # 磁盘上的持久化缓存，进程重启后仍可命中
+    _persistent_cache = LLMCache()
+    # 简单请求是否绕过 SDK，直接发送预序列化的请求体
+    raw_post_enabled = True
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-2.0-flash-exp",
+        base_url: str = None,
+        semantic_cache_enabled: bool = False,
+        embedding_model: str = "text-embedding-004",
+        semantic_threshold: float = 0.92,
+        requests_per_minute: Optional[int] = 600,
+        tokens_per_minute: Optional[int] = 120000,
+        persistent_cache: bool = True
+    ):
         """
         初始化 Gemini 客户端
         
@@ -24,9 +587,21 @@ class GeminiClient:
             api_key: API 密钥
             model: 使用的模型名称
             base_url: 自定义API基础URL，如果为None则使用默认Gemini URL
+            semantic_cache_enabled: 是否启用语义缓存（仅对 temperature <= 0.1 的请求生效）
+            embedding_model: 语义缓存使用的嵌入模型，需由同一厂商的 embeddings 接口提供
+            semantic_threshold: 语义缓存命中所需的最小余弦相似度
+            requests_per_minute: 每分钟请求数上限，None 表示不限制
+            tokens_per_minute: 每分钟输入令牌数上限（按字符数/4 估算），None 表示不限制
+            persistent_cache: temperature 为 0 的响应是否同时写入磁盘缓存，重启后仍可命中
         """
         self.api_key = api_key
         self.model = model
+        self.semantic_cache_enabled = semantic_cache_enabled
+        self.embedding_model = embedding_model
+        self.semantic_threshold = semantic_threshold
+        self.persistent_cache = persistent_cache
+        # 按 (模型, 温度, 系统提示, 动态上下文, 输出格式) 分区，只在同类请求间复用
+        self._semantic_caches: Dict[Tuple, SemanticCache] = {}
         
         # 默认使用Gemini API URL，支持自定义
         if base_url is None:
@@ -34,10 +609,306 @@ class GeminiClient:
         else:
             self.base_url = base_url
             
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=self.base_url
+        self.client = _shared_openai_client(api_key, self.base_url)
+        # 异步客户端的连接池绑定事件循环，按循环分别创建
+        self._aclients = weakref.WeakKeyDictionary()
+        self._aclients_lock = threading.Lock()
+        
+        # 客户端侧限流：请求数与令牌数两个令牌桶，再加 AIMD 并发控制
+        self._request_limiter = RateLimiter(requests_per_minute / 60) if requests_per_minute else None
+        self._token_limiter = RateLimiter(tokens_per_minute / 60, burst=tokens_per_minute) if tokens_per_minute else None
+        self._concurrency = AdaptiveConcurrency()
+        # 厂商拒绝过的 response_format 类型，之后的请求不再携带
+        self._unsupported_formats = set()
+    
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """当前事件循环对应的异步客户端（连接池不能跨事件循环复用）"""
+        return self._async_client(self.api_key)
+    
+    def _async_client(self, api_key: str) -> AsyncOpenAI:
+        """获取当前事件循环中指定密钥的异步客户端"""
+        loop = asyncio.get_running_loop()
+        with self._aclients_lock:
+            clients = self._aclients.get(loop)
+            if clients is None:
+                clients = self._aclients[loop] = {}
+                # 循环结束时由 run_async 关闭；自行管理事件循环时调用 aclose()
+                with _loop_cleanups_lock:
+                    _loop_cleanups.setdefault(loop, []).append(self.aclose)
+            aclient = clients.get(api_key)
+            if aclient is None:
+                http_client = httpx.AsyncClient(
+                    limits=_HTTP_LIMITS,
+                    timeout=_HTTP_TIMEOUT,
+                    http2=_HTTP2_AVAILABLE
+                )
+                aclient = AsyncOpenAI(api_key=api_key, base_url=self.base_url, http_client=http_client)
+                _raw_http_clients[aclient] = http_client
+                clients[api_key] = aclient
+            return aclient
+    
+    async def aclose(self):
+        """关闭当前事件循环中创建的异步客户端及其连接"""
+        with self._aclients_lock:
+            clients = self._aclients.pop(asyncio.get_running_loop(), {})
+        for aclient in clients.values():
+            await aclient.close()
+    
+    def _build_request(
+        self,
+        prompt: str,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        dynamic_context: str = "",
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        构建 chat.completions.create 的请求参数
+        
+        消息顺序固定为 [静态系统提示, 动态上下文(可选), 用户提示]。
+        厂商的提示前缀缓存要求前缀逐字节一致，因此每次请求都会变化的内容
+        只能放在 dynamic_context 中，不能拼进 system_prompt。
+        """
+        messages = [_system_message(system_prompt)]
+        if dynamic_context:
+            messages.append({"role": "system", "content": dynamic_context})
+        messages.append({"role": "user", "content": prompt})
+        
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature
+        }
+        
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+        if response_format and response_format["type"] not in self._unsupported_formats:
+            kwargs["response_format"] = response_format
+        
+        return kwargs
+    
+    @staticmethod
+    def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+        """粗略估算请求的输入令牌数（约 4 个字符一个令牌）"""
+        return sum(len(message["content"]) for message in kwargs["messages"]) // 4 + 1
+    
+    @contextmanager
+    def _slot(self, kwargs: Dict[str, Any]):
+        """等待限流令牌并占用一个并发槽位"""
+        if self._request_limiter:
+            self._request_limiter.acquire()
+        if self._token_limiter:
+            self._token_limiter.acquire(min(self._estimate_tokens(kwargs), self._token_limiter.capacity))
+        self._concurrency.acquire()
+        try:
+            yield
+        finally:
+            self._concurrency.release()
+    
+    @asynccontextmanager
+    async def _aslot(self, kwargs: Dict[str, Any]):
+        """_slot 的异步版本"""
+        if self._request_limiter:
+            await self._request_limiter.aacquire()
+        if self._token_limiter:
+            await self._token_limiter.aacquire(min(self._estimate_tokens(kwargs), self._token_limiter.capacity))
+        await self._concurrency.aacquire()
+        try:
+            yield
+        finally:
+            self._concurrency.release()
+    
+    def _sync_client(self) -> OpenAI:
+        """当前线程使用的同步客户端：批量工作线程用私有客户端，其余线程用共享客户端"""
+        return _worker_openai_client(self.api_key, self.base_url) or self.client
+    
+    def _create(self, kwargs: Dict[str, Any]):
+        """发送 chat.completions 请求，所有同步调用都经过此处限流（流式请求仅在建立时占用槽位）"""
+        with self._slot(kwargs):
+            return self._sync_client().chat.completions.create(**kwargs)
+    
+    async def _acreate(self, kwargs: Dict[str, Any]):
+        """_create 的异步版本"""
+        async with self._aslot(kwargs):
+            return await self.aclient.chat.completions.create(**kwargs)
+    
+    def _raw_body(self, kwargs: Dict[str, Any]) -> Optional[bytes]:
+        """拼接预序列化的请求体，请求含其他参数或动态上下文时返回 None"""
+        if not self.raw_post_enabled or orjson is None or not kwargs.keys() <= _RAW_POST_KEYS:
+            return None
+        messages = kwargs["messages"]
+        if len(messages) != 2:
+            return None
+        head, tail = _request_template(
+            kwargs["model"], messages[0]["content"], kwargs["temperature"], kwargs.get("max_tokens")
+        )
+        return head + orjson.dumps(messages[1]["content"]) + tail
+    
+    @property
+    def _raw_headers(self) -> Dict[str, str]:
+        """直接请求使用的请求头"""
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+    
+    def _raw_complete(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        绕过 SDK 直接发送请求并返回文本内容
+        
+        Returns:
+            生成的文本；请求不适用直接发送或 200 响应无法解析时返回 None，由调用方改走 SDK
+        """
+        client = self._sync_client()
+        http_client = _raw_http_client(client)
+        body = self._raw_body(kwargs) if http_client is not None else None
+        if body is None:
+            return None
+        with self._slot(kwargs):
+            try:
+                response = http_client.post(
+                    self.base_url.rstrip("/") + "/chat/completions", content=body, headers=self._raw_headers
+                )
+            except httpx.TimeoutException as e:
+                raise APITimeoutError(request=e.request) from e
+            except httpx.TransportError as e:
+                raise APIConnectionError(request=e.request) from e
+        return _raw_response_content(response, client)
+    
+    async def _araw_complete(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """_raw_complete 的异步版本"""
+        aclient = self.aclient
+        http_client = _raw_http_client(aclient)
+        body = self._raw_body(kwargs) if http_client is not None else None
+        if body is None:
+            return None
+        async with self._aslot(kwargs):
+            try:
+                response = await http_client.post(
+                    self.base_url.rstrip("/") + "/chat/completions", content=body, headers=self._raw_headers
+                )
+            except httpx.TimeoutException as e:
+                raise APITimeoutError(request=e.request) from e
+            except httpx.TransportError as e:
+                raise APIConnectionError(request=e.request) from e
+        return _raw_response_content(response, aclient)
+    
+    def _retry_wait(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        判断错误是否可重试并计算等待时间
+        
+        Args:
+            error: 请求抛出的异常
+            attempt: 当前是第几次尝试（从 0 开始）
+            
+        Returns:
+            需要等待的秒数，不可重试时返回 None
+        """
+        if not isinstance(error, _RETRYABLE_ERRORS):
+            return None
+        
+        if isinstance(error, RateLimitError):
+            self._concurrency.shrink()
+        # 优先遵循服务端给出的等待时间（429/503 常带有 Retry-After）
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        
+        # 带抖动的指数退避，避免并发请求同时重试
+        return min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt) + random.uniform(0, _BACKOFF_JITTER)
+    
+    def _cache_key(self, kwargs: Dict[str, Any]) -> str:
+        """
+        请求参数规范化 JSON 的 SHA-256 摘要，作为响应缓存键
+        
+        缓存在所有实例间共享，键中包含 base_url，不同厂商的同名模型不会互相命中。
+        """
+        fields = {"base_url": self.base_url, "request": kwargs}
+        if orjson is not None:
+            # orjson 直接输出 bytes，省去一次编码
+            return hashlib.sha256(orjson.dumps(fields, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _semantic_cache(
+        self,
+        system_prompt: str,
+        temperature: float,
+        dynamic_context: str = "",
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> SemanticCache:
+        """
+        获取请求对应的语义缓存分区
+        
+        只有模型、温度、系统提示、动态上下文和输出格式都相同的请求才共享分区，
+        避免 JSON 模式的请求命中普通文本回答，或不同上下文的请求共用同一回答。
+        """
+        partition = (
+            self.model,
+            round(temperature, 2),
+            system_prompt,
+            dynamic_context,
+            (response_format or {}).get("type")
         )
+        cache = self._semantic_caches.get(partition)
+        if cache is None:
+            cache = self._semantic_caches.setdefault(
+                partition, SemanticCache(threshold=self.semantic_threshold)
+            )
+        return cache
+    
+    def _embed(self, text: str) -> Optional["np.ndarray"]:
+        """计算归一化的提示向量，接口出错时返回 None（跳过语义缓存）"""
+        try:
+            response = self.client.embeddings.create(model=self.embedding_model, input=text)
+            return SemanticCache.normalize(response.data[0].embedding)
+        except Exception:
+            return None
+    
+    async def _aembed(self, text: str) -> Optional["np.ndarray"]:
+        """_embed 的异步版本"""
+        try:
+            response = await self.aclient.embeddings.create(model=self.embedding_model, input=text)
+            return SemanticCache.normalize(response.data[0].embedding)
+        except Exception:
+            return None
+    
+    @classmethod
+    def clear_cache(cls):
+        """清空内存中的响应缓存（磁盘缓存请使用 purge_cache）"""
+        cls._response_cache.clear()
+    
+    @classmethod
+    def purge_cache(cls, older_than: Optional[float] = None) -> int:
+        """
+        清理磁盘上的持久化响应缓存
+        
+        Args:
+            older_than: 删除早于多少秒前写入的条目，默认为缓存有效期；0 表示全部删除
+            
+        Returns:
+            删除的条目数
+        """
+        return cls._persistent_cache.purge(older_than)
+    
+    def _cache_get(self, cache_key: str) -> Optional[str]:
+        """依次查询内存缓存和持久化缓存，磁盘命中时回填内存"""
+        cached = self._response_cache.get(cache_key)
+        if cached is None and self.persistent_cache:
+            cached = self._persistent_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.set(cache_key, cached)
+        return cached
+    
+    def _cache_set(self, cache_key: str, content: str):
+        """写入内存缓存和持久化缓存"""
+        self._response_cache.set(cache_key, content)
+        if self.persistent_cache:
+            self._persistent_cache.set(cache_key, content)
+    
+    @classmethod
+    def cache_stats(cls) -> Dict[str, int]:
+        """获取响应缓存统计信息（条目数、命中数、未命中数）"""
+        return cls._response_cache.stats()
     
     def generate_content(
         self, 
@@ -45,55 +916,218 @@ class GeminiClient:
         system_prompt: str = "You are a helpful assistant.",
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        dynamic_context: str = "",
+        stream: bool = False,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         生成内容
         
         Args:
             prompt: 用户提示
-            system_prompt: 系统提示
+            system_prompt: 静态系统提示，应在多次调用间保持不变以命中厂商的前缀缓存
             temperature: 温度参数，控制随机性
             max_tokens: 最大令牌数
             max_retries: 最大重试次数
+            dynamic_context: 每次请求变化的上下文，作为第二条系统消息放在静态系统提示之后
+            stream: 是否以流式请求并在本地拼接，长文本可更早收到首个令牌、避免读超时
+            response_format: 透传给厂商的输出格式，如 {"type": "json_object"}；厂商不支持时自动去掉
             
         Returns:
-            生成的文本内容
+            生成的文本内容；temperature 为 0 时相同请求直接返回缓存结果
         """
-        for attempt in range(max_retries):
+        kwargs = self._build_request(
+            prompt, system_prompt, temperature, max_tokens, dynamic_context, response_format
+        )
+        
+        cache_key = self._cache_key(kwargs) if temperature == 0 else None
+        if cache_key:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # 精确匹配未命中时查询语义缓存
+        semantic_vec = None
+        if self.semantic_cache_enabled and temperature <= 0.1:
+            semantic_vec = self._embed(prompt)
+            if semantic_vec is not None:
+                semantic_cache = self._semantic_cache(
+                    system_prompt, temperature, dynamic_context, response_format
+                )
+                cached = semantic_cache.lookup(semantic_vec)
+                if cached is not None:
+                    return cached
+        
+        attempt = 0
+        while attempt < max_retries:
             try:
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ]
+                if stream:
+                    content = self._collect_stream(kwargs)
+                else:
+                    content = self._raw_complete(kwargs)
+                    if content is None:
+                        response = self._create(kwargs)
+                        content = response.choices[0].message.content if (
+                            response.choices and response.choices[0].message
+                        ) else None
                 
-                kwargs = {
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": temperature
-                }
+                if content:
+                    if cache_key:
+                        self._cache_set(cache_key, content)
+                    if semantic_vec is not None:
+                        semantic_cache.add(semantic_vec, content)
+                    return content
+                else:
+                    return "模型没有返回预期的内容"
+                    
+            except Exception as e:
+                if "response_format" in kwargs and _rejects_response_format(e):
+                    # 厂商不支持该输出格式：记住后去掉参数立即重发，不计入重试次数
+                    self._unsupported_formats.add(kwargs["response_format"]["type"])
+                    kwargs = {key: value for key, value in kwargs.items() if key != "response_format"}
+                    continue
                 
-                if max_tokens:
-                    kwargs["max_tokens"] = max_tokens
+                # 网络或临时错误按退避时间重试，限流时同时收缩并发
+                wait_time = self._retry_wait(e, attempt)
+                if wait_time is not None and attempt < max_retries - 1:
+                    time.sleep(wait_time)
+                    attempt += 1
+                    continue
                 
-                response = self.client.chat.completions.create(**kwargs)
+                return f"API 调用错误: {str(e)}"
+        
+        return "API 调用错误: 达到最大重试次数"
+    
+    def _collect_stream(self, kwargs: Dict[str, Any]) -> str:
+        """以流式方式发送请求并拼接全部文本片段"""
+        parts = []
+        for chunk in self._create({**kwargs, "stream": True}):
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        return "".join(parts)
+    
+    def generate_content_stream(
+        self, 
+        prompt: str, 
+        system_prompt: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        dynamic_context: str = ""
+    ) -> Iterator[str]:
+        """
+        流式生成内容，逐块返回文本
+        
+        Args:
+            prompt: 用户提示
+            system_prompt: 静态系统提示，应在多次调用间保持不变以命中厂商的前缀缓存
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大令牌数
+            dynamic_context: 每次请求变化的上下文，作为第二条系统消息放在静态系统提示之后
+            
+        Yields:
+            生成的文本片段；首个片段返回前出错时返回一条 "API 调用错误: ..." 文本
+        """
+        kwargs = self._build_request(prompt, system_prompt, temperature, max_tokens, dynamic_context)
+        kwargs["stream"] = True
+        
+        started = False
+        try:
+            for chunk in self._create(kwargs):
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    started = True
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            # 已输出部分内容时无法再以错误文本替代，直接抛出
+            if started:
+                raise
+            yield f"API 调用错误: {str(e)}"
+            return
+        
+        if not started:
+            yield "模型没有返回预期的内容"
+    
+    async def agenerate_content(
+        self, 
+        prompt: str, 
+        system_prompt: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_retries: int = 3,
+        dynamic_context: str = "",
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        异步生成内容，参数与返回值同 generate_content
+        
+        Args:
+            prompt: 用户提示
+            system_prompt: 静态系统提示，应在多次调用间保持不变以命中厂商的前缀缓存
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大令牌数
+            max_retries: 最大重试次数
+            dynamic_context: 每次请求变化的上下文，作为第二条系统消息放在静态系统提示之后
+            response_format: 透传给厂商的输出格式，厂商不支持时自动去掉
+            
+        Returns:
+            生成的文本内容
+        """
+        kwargs = self._build_request(
+            prompt, system_prompt, temperature, max_tokens, dynamic_context, response_format
+        )
+        
+        cache_key = self._cache_key(kwargs) if temperature == 0 else None
+        if cache_key:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # 精确匹配未命中时查询语义缓存
+        semantic_vec = None
+        if self.semantic_cache_enabled and temperature <= 0.1:
+            semantic_vec = await self._aembed(prompt)
+            if semantic_vec is not None:
+                semantic_cache = self._semantic_cache(
+                    system_prompt, temperature, dynamic_context, response_format
+                )
+                cached = semantic_cache.lookup(semantic_vec)
+                if cached is not None:
+                    return cached
+        
+        attempt = 0
+        while attempt < max_retries:
+            try:
+                content = await self._araw_complete(kwargs)
+                if content is None:
+                    response = await self._acreate(kwargs)
+                    content = response.choices[0].message.content if (
+                        response.choices and response.choices[0].message
+                    ) else None
                 
-                if response.choices and response.choices[0].message and response.choices[0].message.content:
-                    return response.choices[0].message.content
+                if content:
+                    if cache_key:
+                        self._cache_set(cache_key, content)
+                    if semantic_vec is not None:
+                        semantic_cache.add(semantic_vec, content)
+                    return content
                 else:
                     return "模型没有返回预期的内容"
                     
             except Exception as e:
-                error_msg = str(e)
+                if "response_format" in kwargs and _rejects_response_format(e):
+                    # 厂商不支持该输出格式：记住后去掉参数立即重发，不计入重试次数
+                    self._unsupported_formats.add(kwargs["response_format"]["type"])
+                    kwargs = {key: value for key, value in kwargs.items() if key != "response_format"}
+                    continue
                 
-                # 检查是否是网络或临时错误
-                if attempt < max_retries - 1 and any(keyword in error_msg.lower() for keyword in 
-                    ['timeout', 'connection', 'network', 'rate limit', '429', '503', '502']):
-                    wait_time = (attempt + 1) * 2  # 指数退避
-                    time.sleep(wait_time)
+                # 网络或临时错误按退避时间重试，限流时同时收缩并发
+                wait_time = self._retry_wait(e, attempt)
+                if wait_time is not None and attempt < max_retries - 1:
+                    await asyncio.sleep(wait_time)
+                    attempt += 1
                     continue
                 
-                return f"API 调用错误: {error_msg}"
+                return f"API 调用错误: {str(e)}"
         
         return "API 调用错误: 达到最大重试次数"
     
@@ -101,47 +1135,97 @@ class GeminiClient:
         self, 
         prompt: str, 
         system_prompt: str = "You are a helpful assistant. Always respond with valid JSON.",
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        schema: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         生成 JSON 格式的内容
         
+        优先使用厂商的 JSON 模式（response_format=json_object）保证输出为合法 JSON，
+        厂商不支持时退回按代码块提取。OpenAI 要求提示中出现 "JSON" 字样，默认系统提示已包含。
+        
         Args:
             prompt: 用户提示
             system_prompt: 系统提示
             temperature: 温度参数
+            schema: 期望的 JSON Schema；提供时请求厂商按 schema 约束输出，并在本地校验
             
         Returns:
             解析后的 JSON 数据
         """
         try:
-            content = self.generate_content(prompt, system_prompt, temperature)
+            content = self.generate_content(
+                prompt, system_prompt, temperature, response_format=self._json_response_format(schema)
+            )
+        except Exception as e:
+            return {"error": f"生成 JSON 内容时出错: {str(e)}"}
+        
+        return self._validate_json(self._parse_json_content(content), schema)
+    
+    async def agenerate_json_content(
+        self, 
+        prompt: str, 
+        system_prompt: str = "You are a helpful assistant. Always respond with valid JSON.",
+        temperature: float = 0.7,
+        schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        异步生成 JSON 格式的内容，参数与返回值同 generate_json_content
+        
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示
+            temperature: 温度参数
+            schema: 期望的 JSON Schema
             
+        Returns:
+            解析后的 JSON 数据
+        """
+        try:
+            content = await self.agenerate_content(
+                prompt, system_prompt, temperature, response_format=self._json_response_format(schema)
+            )
+        except Exception as e:
+            return {"error": f"生成 JSON 内容时出错: {str(e)}"}
+        
+        return self._validate_json(self._parse_json_content(content), schema)
+    
+    def _json_response_format(self, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """有 schema 且厂商支持时使用 json_schema 约束输出，否则使用 json_object 模式"""
+        if schema is None or "json_schema" in self._unsupported_formats:
+            return _JSON_OBJECT_FORMAT
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "response", "schema": schema, "strict": True}
+        }
+    
+    @staticmethod
+    def _validate_json(data: Any, schema: Optional[Dict[str, Any]]) -> Any:
+        """按 schema 校验解析结果，不符合时返回错误字典"""
+        if schema is None or (isinstance(data, dict) and "error" in data):
+            return data
+        validator = _schema_validator(schema)
+        if validator is None:
+            return data
+        error = jsonschema.exceptions.best_match(validator.iter_errors(data))
+        if error is not None:
+            return {"error": f"JSON 不符合 schema: {error.message}", "raw_content": data}
+        return data
+    
+    @staticmethod
+    def _parse_json_content(content: str) -> Dict[str, Any]:
+        """从模型输出中提取并解析 JSON"""
+        try:
             # 检查是否是错误响应
             if content.startswith("API 调用错误:"):
                 return {"error": content}
             
-            # 尝试提取 JSON 内容
-            json_content = content
-            if "```json" in content:
-                json_start = content.find("```json") + 7
-                json_end = content.find("```", json_start)
-                if json_end != -1:
-                    json_content = content[json_start:json_end].strip()
-            elif "```" in content:
-                # 处理没有json标记的代码块
-                json_start = content.find("```") + 3
-                json_end = content.find("```", json_start)
-                if json_end != -1:
-                    json_content = content[json_start:json_end].strip()
-            
-            # 清理JSON内容
-            json_content = json_content.strip()
-            if json_content.startswith('```'):
-                json_content = json_content[3:].strip()
-            if json_content.endswith('```'):
-                json_content = json_content[:-3].strip()
+            # 提取第一个代码块，没有代码块时直接解析全文
+            match = _JSON_FENCE.search(content)
+            json_content = match.group(1) if match else content.strip()
             
+            if orjson is not None:
+                return orjson.loads(json_content)
             return json.loads(json_content)
             
         except json.JSONDecodeError as e:
@@ -149,143 +1233,373 @@ class GeminiClient:
         except Exception as e:
             return {"error": f"生成 JSON 内容时出错: {str(e)}"}
     
-    def _generate_single_content(self, args):
-        """单个内容生成的内部方法，用于多线程"""
-        prompt, system_prompt, temperature = args
-        return self.generate_content(prompt, system_prompt, temperature)
+    @staticmethod
+    def _dedupe_prompts(prompts: List[str], temperature: float):
+        """
+        合并批量请求中的重复提示
+        
+        仅在 temperature 为 0 时合并：非零温度下重复提示是有意的多次采样
+        （例如批量生成不同的专利创意），不能合并。
+        
+        Returns:
+            (需要实际请求的提示列表, 每个原始提示对应的结果下标)
+        """
+        if temperature != 0:
+            return prompts, range(len(prompts))
+        index_of: Dict[str, int] = {}
+        order = [index_of.setdefault(prompt, len(index_of)) for prompt in prompts]
+        return list(index_of), order
+    
+    @staticmethod
+    async def _arun_batch(
+        items: List[Any],
+        worker,
+        max_workers: int,
+        rate_limit: Optional[float],
+        request_timeout: Optional[float],
+        batch_timeout: Optional[float]
+    ) -> List[Any]:
+        """
+        并发执行批量协程
+        
+        Args:
+            items: 输入列表
+            worker: 接收单个输入并返回协程的函数
+            max_workers: 最大并发数
+            rate_limit: 每秒请求数上限
+            request_timeout: 单个请求的超时秒数
+            batch_timeout: 整批的截止秒数，到期后取消剩余请求
+            
+        Returns:
+            与 items 顺序对应的结果，失败的位置为异常对象，超时为 asyncio.TimeoutError
+        """
+        if not items:
+            return []
+        
+        semaphore = asyncio.Semaphore(max_workers)
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        
+        async def run_single(item):
+            async with semaphore:
+                if limiter:
+                    await limiter.aacquire()
+                return await asyncio.wait_for(worker(item), request_timeout)
+        
+        tasks = [asyncio.ensure_future(run_single(item)) for item in items]
+        _, pending = await asyncio.wait(tasks, timeout=batch_timeout)
+        
+        # 整批到期：取消仍在排队或执行中的请求，释放并发槽位
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        return [
+            asyncio.TimeoutError() if task in pending else (task.exception() or task.result())
+            for task in tasks
+        ]
+    
+    @staticmethod
+    def _failure_message(error: BaseException) -> str:
+        """批量结果中失败位置的说明文字"""
+        if isinstance(error, asyncio.TimeoutError):
+            return "请求超时"
+        return str(error)
     
     def batch_generate(
         self, 
         prompts: List[str], 
         system_prompt: str = "You are a helpful assistant.",
         temperature: float = 0.7,
-        max_workers: int = 3
+        max_workers: int = 32,
+        rate_limit: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        batch_timeout: Optional[float] = None
     ) -> List[str]:
         """
-        批量生成内容（多线程）
+        批量生成内容（asyncio 协程并发）
+        
+        同步接口，内部通过 run_async 执行 abatch_generate，
+        不能在已运行事件循环的线程中调用（请直接 await abatch_generate）。
+        temperature 为 0 时重复的提示只请求一次，结果按原始位置回填。
         
         Args:
             prompts: 提示列表
             system_prompt: 系统提示
             temperature: 温度参数
-            max_workers: 最大线程数
+            max_workers: 最大并发请求数
+            rate_limit: 每秒请求数上限，None 表示不限流
+            request_timeout: 单个请求的超时秒数（不含排队时间），超时的位置返回 "生成失败: 请求超时"
+            batch_timeout: 整批的截止秒数，到期后取消仍未完成的请求并同样标记为超时
             
         Returns:
             生成的内容列表
         """
-        results = []
+        return run_async(self.abatch_generate(
+            prompts, system_prompt, temperature, max_workers, rate_limit,
+            request_timeout, batch_timeout
+        ))
+    
+    async def abatch_generate(
+        self, 
+        prompts: List[str], 
+        system_prompt: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_workers: int = 32,
+        rate_limit: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        batch_timeout: Optional[float] = None
+    ) -> List[str]:
+        """
+        批量生成内容的协程版本，参数与返回值同 batch_generate
+        """
+        unique_prompts, order = self._dedupe_prompts(prompts, temperature)
+        results = await self._arun_batch(
+            unique_prompts,
+            lambda prompt: self.agenerate_content(prompt, system_prompt, temperature),
+            max_workers, rate_limit, request_timeout, batch_timeout
+        )
+        results = [
+            f"生成失败: {self._failure_message(result)}" if isinstance(result, BaseException) else result
+            for result in results
+        ]
+        return [results[i] for i in order]
+    
+    def batch_generate_stream(
+        self,
+        prompts: List[str],
+        system_prompt: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_workers: int = 32,
+        rate_limit: Optional[float] = None
+    ) -> List[Iterator[str]]:
+        """
+        批量流式生成内容
         
-        # 准备参数
-        args_list = [(prompt, system_prompt, temperature) for prompt in prompts]
+        每个提示由后台线程写入各自的队列，立即返回与 prompts 顺序对应的迭代器列表，
+        调用方可以先消费已开始输出的结果，无需等待最慢的请求。
         
-        # 使用线程池进行并发处理
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_prompt = {
-                executor.submit(self._generate_single_content, args): i 
-                for i, args in enumerate(args_list)
-            }
+        Args:
+            prompts: 提示列表
+            system_prompt: 系统提示
+            temperature: 温度参数
+            max_workers: 最大并发请求数
+            rate_limit: 每秒请求数上限，None 表示不限流
             
-            # 按原始顺序收集结果
-            results = [None] * len(prompts)
-            for future in concurrent.futures.as_completed(future_to_prompt):
-                index = future_to_prompt[future]
-                try:
-                    result = future.result()
-                    results[index] = result
-                except Exception as e:
-                    results[index] = f"生成失败: {str(e)}"
-        
-        return results
+        Returns:
+            文本片段迭代器列表；流中途出错时对应迭代器抛出异常
+        """
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        done = object()
+        queues = [queue.SimpleQueue() for _ in prompts]
+        
+        def produce(prompt, q):
+            try:
+                if limiter:
+                    limiter.acquire()
+                for piece in self.generate_content_stream(prompt, system_prompt, temperature):
+                    q.put(piece)
+            except Exception as e:
+                q.put(e)
+            finally:
+                q.put(done)
+        
+        def consume(q):
+            while True:
+                item = q.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers, initializer=init_worker_thread)
+        for prompt, q in zip(prompts, queues):
+            executor.submit(produce, prompt, q)
+        # 不等待任务结束，已提交的任务会继续执行，线程在全部完成后退出
+        executor.shutdown(wait=False)
+        
+        return [consume(q) for q in queues]
     
     def batch_generate_json(
         self,
         prompts: List[str],
         system_prompt: str = "You are a helpful assistant. Always respond with valid JSON.",
         temperature: float = 0.7,
-        max_workers: int = 3
+        max_workers: int = 32,
+        rate_limit: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        batch_timeout: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
-        批量生成JSON内容（多线程）
+        批量生成JSON内容（asyncio 协程并发）
+        
+        同步接口，内部通过 run_async 执行 abatch_generate_json。
+        temperature 为 0 时重复的提示只请求一次，结果按原始位置回填。
         
         Args:
             prompts: 提示列表
             system_prompt: 系统提示
             temperature: 温度参数
-            max_workers: 最大线程数
+            max_workers: 最大并发请求数
+            rate_limit: 每秒请求数上限，None 表示不限流
+            request_timeout: 单个请求的超时秒数（不含排队时间）
+            batch_timeout: 整批的截止秒数，到期后取消仍未完成的请求
             
         Returns:
             生成的JSON数据列表
         """
-        results = []
-        
-        def generate_single_json(prompt):
-            return self.generate_json_content(prompt, system_prompt, temperature)
-        
-        # 使用线程池进行并发处理
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_prompt = {
-                executor.submit(generate_single_json, prompt): i 
-                for i, prompt in enumerate(prompts)
-            }
-            
-            # 按原始顺序收集结果
-            results = [None] * len(prompts)
-            for future in concurrent.futures.as_completed(future_to_prompt):
-                index = future_to_prompt[future]
-                try:
-                    result = future.result()
-                    results[index] = result
-                except Exception as e:
-                    results[index] = {"error": f"生成失败: {str(e)}"}
-        
-        return results
+        return run_async(self.abatch_generate_json(
+            prompts, system_prompt, temperature, max_workers, rate_limit,
+            request_timeout, batch_timeout
+        ))
+    
+    async def abatch_generate_json(
+        self,
+        prompts: List[str],
+        system_prompt: str = "You are a helpful assistant. Always respond with valid JSON.",
+        temperature: float = 0.7,
+        max_workers: int = 32,
+        rate_limit: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        batch_timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量生成JSON内容的协程版本，参数与返回值同 batch_generate_json
+        """
+        unique_prompts, order = self._dedupe_prompts(prompts, temperature)
+        results = await self._arun_batch(
+            unique_prompts,
+            lambda prompt: self.agenerate_json_content(prompt, system_prompt, temperature),
+            max_workers, rate_limit, request_timeout, batch_timeout
+        )
+        results = [
+            {"error": f"生成失败: {self._failure_message(result)}"} if isinstance(result, BaseException) else result
+            for result in results
+        ]
+        if len(unique_prompts) == len(prompts):
+            return results
+        # 重复提示共享同一结果，返回浅副本以免调用方修改时互相影响；
+        # 模型可能返回数组或字符串等非字典结果，按原类型复制，由调用方处理
+        return [copy.copy(results[i]) for i in order]
     
     @staticmethod
     def get_predefined_providers():
-        """获取预定义的模型厂商配置"""
-        return {
-            "Google Gemini": {
-                "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
-                "models": [
-                    "gemini-2.0-flash-exp",
-                    "gemini-2.5-flash-preview-05-20", 
-                    "gemini-2.5-pro-preview-05-06"
-                ]
-            },
-            "OpenAI": {
-                "base_url": "https://api.openai.com/v1/",
-                "models": [
-                    "gpt-4o",
-                    "gpt-4o-mini",
-                    "gpt-4-turbo",
-                    "gpt-3.5-turbo"
-                ]
-            },
-            "Anthropic Claude": {
-                "base_url": "https://api.anthropic.com/v1/",
-                "models": [
-                    "claude-3-5-sonnet-20241022",
-                    "claude-3-5-haiku-20241022",
-                    "claude-3-opus-20240229"
-                ]
-            },
-            "DeepSeek": {
-                "base_url": "https://api.deepseek.com/v1/",
-                "models": [
-                    "deepseek-chat",
-                    "deepseek-coder"
-                ]
-            },
-            "智谱AI": {
-                "base_url": "https://open.bigmodel.cn/api/paas/v4/",
-                "models": [
-                    "glm-4-plus",
-                    "glm-4-0520",
-                    "glm-4"
-                ]
-            },
-            "自定义": {
-                "base_url": "",
-                "models": []
-            }
-        } 
\ No newline at end of file
+        """获取预定义的模型厂商配置（只读，模型列表为元组）"""
+        return _PROVIDERS
+
+
+class MultiKeyGeminiClient(GeminiClient):
+    """
+    多密钥客户端：在多个 API 密钥之间分配请求，聚合各密钥的配额
+    
+    每次请求选择未处于冷却期、在途请求最少的密钥；某个密钥被限流后
+    按 Retry-After 冷却，重试会转到其他可用密钥。接口与 GeminiClient 相同。
+    """
+    
+    # 限流响应未给出 Retry-After 时的密钥冷却秒数
+    key_cooldown = 5.0
+    # 请求需经 _create 选择密钥，不走直接发送
+    raw_post_enabled = False
+    
+    def __init__(
+        self,
+        api_keys: List[str],
+        model: str = "gemini-2.0-flash-exp",
+        base_url: str = None,
+        requests_per_minute: Optional[int] = 600,
+        tokens_per_minute: Optional[int] = 120000,
+        **kwargs
+    ):
+        """
+        初始化多密钥客户端
+        
+        Args:
+            api_keys: API 密钥列表，须属于同一厂商
+            model: 使用的模型名称
+            base_url: 自定义API基础URL
+            requests_per_minute: 每个密钥的每分钟请求数上限，None 表示不限制
+            tokens_per_minute: 每个密钥的每分钟输入令牌数上限，None 表示不限制
+            **kwargs: 其他参数，同 GeminiClient
+        """
+        if not api_keys:
+            raise ValueError("至少需要提供一个 API 密钥")
+        
+        count = len(api_keys)
+        super().__init__(
+            api_keys[0],
+            model,
+            base_url,
+            requests_per_minute=requests_per_minute * count if requests_per_minute else None,
+            tokens_per_minute=tokens_per_minute * count if tokens_per_minute else None,
+            **kwargs
+        )
+        self.api_keys = list(api_keys)
+        self._clients = [_shared_openai_client(key, self.base_url) for key in self.api_keys]
+        self._inflight = [0] * count
+        self._cooldown = [0.0] * count
+        self._next = 0
+        self._pick_lock = threading.Lock()
+    
+    def _pick(self) -> int:
+        """选择一个密钥并计入在途请求，全部冷却时选择最早恢复的密钥"""
+        with self._pick_lock:
+            now = time.monotonic()
+            count = len(self.api_keys)
+            ready = [i for i, until in enumerate(self._cooldown) if until <= now]
+            if ready:
+                # 在途数相同时轮询，避免请求总落在第一个密钥上
+                index = min(ready, key=lambda i: (self._inflight[i], (i - self._next) % count))
+            else:
+                index = min(range(count), key=self._cooldown.__getitem__)
+            self._next = (index + 1) % count
+            self._inflight[index] += 1
+            return index
+    
+    def _release(self, index: int, error: Optional[Exception] = None):
+        """请求结束，释放在途计数；被限流时让该密钥进入冷却"""
+        with self._pick_lock:
+            self._inflight[index] -= 1
+            if isinstance(error, RateLimitError):
+                retry_after = _retry_after_seconds(error)
+                wait = retry_after if retry_after is not None else self.key_cooldown
+                self._cooldown[index] = max(self._cooldown[index], time.monotonic() + wait)
+    
+    def _has_ready_key(self) -> bool:
+        """是否存在未处于冷却期的密钥"""
+        now = time.monotonic()
+        with self._pick_lock:
+            return any(until <= now for until in self._cooldown)
+    
+    def _create(self, kwargs: Dict[str, Any]):
+        """选择密钥后发送同步请求"""
+        with self._slot(kwargs):
+            index = self._pick()
+            error = None
+            try:
+                client = _worker_openai_client(self.api_keys[index], self.base_url) or self._clients[index]
+                return client.chat.completions.create(**kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._release(index, error)
+    
+    async def _acreate(self, kwargs: Dict[str, Any]):
+        """选择密钥后发送异步请求"""
+        async with self._aslot(kwargs):
+            index = self._pick()
+            error = None
+            try:
+                return await self._async_client(self.api_keys[index]).chat.completions.create(**kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._release(index, error)
+    
+    def _retry_wait(self, error: Exception, attempt: int) -> Optional[float]:
+        """限流时若还有可用密钥则立即换密钥重试（不收缩并发），否则按单密钥规则等待"""
+        if isinstance(error, RateLimitError) and self._has_ready_key():
+            return 0.0
+        return super()._retry_wait(error, attempt)
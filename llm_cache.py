@@ -0,0 +1,187 @@
+"""
+LLM 响应持久化缓存
+以 SQLite 存储模型响应，相同请求在进程重启后仍可直接复用
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+
+class LLMCache:
+    """基于 SQLite 的持久化 LLM 响应缓存，进程重启后仍可命中；较大的内容用 zlib 压缩存储"""
+    
+    # 超过容量上限时淘汰到上限的该比例，避免每次写入都触发淘汰
+    EVICT_RATIO = 0.9
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 7 * 86400,
+        compress_threshold: int = 4096,
+        size_limit: int = 1 << 30
+    ):
+        """
+        初始化持久化缓存（首次读写时才创建数据库文件）
+        
+        Args:
+            path: 数据库文件路径，默认 ~/.cache/gemini_client/responses.sqlite3
+            ttl: 条目有效期（秒）
+            compress_threshold: 内容超过该字节数时压缩存储
+            size_limit: 已存内容（压缩后）的总字节数上限，超过时删除最早写入的条目
+        """
+        self.path = path or os.path.join(
+            os.path.expanduser("~"), ".cache", "gemini_client", "responses.sqlite3"
+        )
+        self.ttl = ttl
+        self.compress_threshold = compress_threshold
+        self.size_limit = size_limit
+        self._size = 0  # 已存内容的总字节数，建库时统计，写入时累加
+        self._conn = None
+        self._disabled = False  # 数据库无法创建或打开时停用缓存，之后的读写直接跳过
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        """
+        由请求字段生成缓存键
+        
+        Args:
+            **fields: 决定响应内容的字段，如模型、系统提示、用户提示和温度
+            
+        Returns:
+            字段规范化 JSON 的 SHA-256 摘要
+        """
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """
+        获取数据库连接，首次调用时建库建表（调用方需持有锁）
+        
+        目录不可写等原因导致建库失败时停用缓存，避免每次请求重复尝试。
+        """
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                    "compressed INTEGER NOT NULL, created REAL NOT NULL)"
+                )
+                # 过期清理和容量淘汰都按写入时间查找
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+                conn.commit()
+                self._size = self._stored_bytes(conn)
+            except (sqlite3.Error, OSError) as e:
+                self._disabled = True
+                print(f"⚠️ 响应缓存不可用，已停用: {str(e)}")
+                raise
+            self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def _stored_bytes(conn: sqlite3.Connection) -> int:
+        """统计数据库中已存内容的总字节数"""
+        return conn.execute("SELECT COALESCE(SUM(length(value)), 0) FROM responses").fetchone()[0]
+    
+    def _evict(self, conn: sqlite3.Connection):
+        """
+        总字节数超过 size_limit 时按写入时间删除最早的条目（调用方需持有锁）
+        
+        其他进程也可能写入同一数据库，淘汰前重新统计实际大小。
+        """
+        self._size = self._stored_bytes(conn)
+        if self._size <= self.size_limit:
+            return
+        target = self.size_limit * self.EVICT_RATIO
+        doomed = []
+        for key, length in conn.execute("SELECT key, length(value) FROM responses ORDER BY created"):
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= length
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中、已过期或数据库不可用时返回 None；过期条目读到时即删除"""
+        if self._disabled:
+            return None
+        expired = False
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT value, compressed, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[2] < time.time() - self.ttl:
+                    expired = True
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self._size -= len(row[0])
+        except (sqlite3.Error, OSError):
+            row = None
+        if row is None or expired:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value, compressed, _ = row
+        return (zlib.decompress(value) if compressed else value).decode("utf-8")
+    
+    def set(self, key: str, value: str):
+        """写入缓存，数据库不可用时静默跳过"""
+        if self._disabled:
+            return
+        data = value.encode("utf-8")
+        compressed = len(data) > self.compress_threshold
+        if compressed:
+            data = zlib.compress(data)
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, compressed, created) VALUES (?, ?, ?, ?)",
+                    (key, data, int(compressed), time.time())
+                )
+                self._size += len(data)
+                if self._size > self.size_limit:
+                    self._evict(conn)
+                conn.commit()
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def purge(self, older_than: Optional[float] = None) -> int:
+        """
+        删除过旧的条目
+        
+        Args:
+            older_than: 删除早于多少秒前写入的条目，默认为 ttl；0 表示全部删除
+            
+        Returns:
+            删除的条目数
+        """
+        if self._disabled:
+            return 0
+        cutoff = time.time() - (self.ttl if older_than is None else older_than)
+        try:
+            with self._lock:
+                conn = self._connection()
+                removed = conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+                conn.commit()
+                self._size = self._stored_bytes(conn)
+                return removed
+        except (sqlite3.Error, OSError):
+            return 0
+    
+    def stats(self) -> Dict[str, int]:
+        """返回本实例的命中统计"""
+        return {"hits": self.hits, "misses": self.misses}
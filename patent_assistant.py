@@ -3,20 +3,127 @@
 提供专利创意生成和完整专利文档撰写功能，支持多线程处理和数据持久化
 """
 
-from gemini_client import GeminiClient
+from gemini_client import GeminiClient, RateLimiter, run_async
+from llm_cache import LLMCache
+from patent_store import PatentStore
 from prompt_templates import PromptTemplates
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable, Awaitable
+import asyncio
 import concurrent.futures
 import threading
-import os
 from datetime import datetime
 
 
+# 系统提示词：各调用点共用同一字符串，保持请求前缀一致以命中厂商侧的提示词缓存
+IDEA_SYSTEM_PROMPT = "你是一位资深的专利专家，专门从事服务器技术领域的创新研究。请严格按照JSON格式返回结果。"
+PATENT_SYSTEM_PROMPT = "你是一位资深的专利撰写专家，具有20年的专利申请经验。请按照国际专利申请标准撰写完整的专利文档。"
+OPTIMIZATION_SYSTEM_PROMPT = "你是一位专利优化专家，擅长提升专利文档的质量和专业性。"
+
+
+def _error_patent(
+    idea: Dict[str, Any],
+    content: str,
+    generated_at: str,
+    patent_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    构建生成失败的专利文档
+    
+    Args:
+        idea: 专利创意
+        content: 错误说明，作为专利内容
+        generated_at: 生成时间
+        patent_id: 专利ID，默认由创意ID转换而来
+        
+    Returns:
+        状态为 error 的专利文档
+    """
+    return {
+        "id": patent_id or idea["id"].replace("idea_", "patent_"),
+        "title": idea.get("title", "未知标题"),
+        "features": idea.get("features", []),
+        "content": content,
+        "generated_at": generated_at,
+        "status": "error"
+    }
+
+
+def _patent_request(
+    templates: PromptTemplates,
+    idea: Dict[str, Any],
+    now_fn: Callable[[], str]
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    准备单个创意的专利生成请求
+    
+    Returns:
+        (创意本身出错时的错误文档, 提示词)，两者只有一个不为 None
+    """
+    if "error" in idea:
+        # 出错的创意保留原ID，不发出请求
+        return _error_patent(idea, f"无法生成专利内容：{idea['error']}", now_fn(), patent_id=idea["id"]), None
+    return None, templates.get_full_patent_prompt(idea.get("title", "未知标题"), idea.get("features", []))
+
+
+def _draft_patent(idea: Dict[str, Any], content: str, generated_at: str) -> Dict[str, Any]:
+    """由生成的内容构建草稿状态的专利文档"""
+    return {
+        "id": idea["id"].replace("idea_", "patent_"),
+        "title": idea.get("title", "未知标题"),
+        "features": idea.get("features", []),
+        "content": content,
+        "generated_at": generated_at,
+        "status": "draft"
+    }
+
+
+async def _agenerate_single_patent(
+    agenerate: Callable[..., Awaitable[str]],
+    templates: PromptTemplates,
+    idea: Dict[str, Any],
+    temperature: float,
+    system_prompt: str,
+    now_fn: Callable[[], str]
+) -> Dict[str, Any]:
+    """
+    根据单个创意生成专利文档，供批量生成的协程调用
+    
+    Args:
+        agenerate: 异步生成函数，参数为 (prompt, system_prompt, temperature)
+        templates: 提示词模板
+        idea: 专利创意
+        temperature: 生成温度
+        system_prompt: 系统提示
+        now_fn: 返回当前时间字符串的函数
+        
+    Returns:
+        专利文档
+    """
+    error_doc, prompt = _patent_request(templates, idea, now_fn)
+    if error_doc is not None:
+        return error_doc
+    return _draft_patent(idea, await agenerate(prompt, system_prompt, temperature), now_fn())
+
+
 class PatentAssistant:
     """专利撰写助手类，支持多线程处理和数据持久化"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp", base_url: str = None, data_file: str = "patents_data.json"):
+    # 共享限流器允许的突发请求数
+    RATE_LIMIT_BURST = 10
+    # 低于该温度的生成结果视为确定性结果，默认走缓存
+    CACHE_TEMPERATURE = 0.05
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-2.0-flash-exp",
+        base_url: str = None,
+        data_file: str = "patents_data.json",
+        save_mode: str = "immediate",
+        max_concurrency: int = 16,
+        requests_per_minute: Optional[int] = 60,
+        store: Optional[PatentStore] = None
+    ):
         """
         初始化专利助手
         
@@ -25,111 +132,210 @@ class PatentAssistant:
             model: 使用的模型名称
             base_url: 自定义API基础URL
             data_file: 数据存储文件路径
+            save_mode: 保存模式，"immediate"、"batched" 或 "manual"
+            max_concurrency: 批量生成的默认并发请求数
+            requests_per_minute: 批量生成的每分钟请求数上限（令牌桶，突发 10 个），
+                应设为厂商对所用模型的 RPM 限制；None 表示不限流
+            store: 共享的专利存储，同一数据文件的多个助手（如不同模型）必须共享同一存储；
+                传入时忽略 data_file 和 save_mode
         """
-        self.client = GeminiClient(api_key, model, base_url)
-        self.templates = PromptTemplates()
-        self.data_file = data_file
-        self.patents = []  # 存储生成的专利
-        self._lock = threading.Lock()  # 线程锁，保护共享资源
+        # 先创建存储，保存模式无效时不创建客户端
+        self.store = store if store is not None else PatentStore(data_file, save_mode)
         
-        # 加载已有的专利数据
-        self._load_patents()
+        # 响应只在本类的 _cache 中持久化一份，客户端不再重复写入同一数据库
+        self.client = GeminiClient(api_key, model, base_url, persistent_cache=False)
+        self.templates = PromptTemplates()
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        # 所有批量生成共享的限流器，批量调用传入 rate_limit 时改用独立限流
+        self._rate_limiter = (
+            RateLimiter(requests_per_minute / 60, burst=self.RATE_LIMIT_BURST)
+            if requests_per_minute else None
+        )
+        self._cache = LLMCache()  # 专利生成与优化结果的持久化缓存
+        # 进行中的生成请求：缓存键 -> Future，合并并发的相同请求
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+    
+    @property
+    def patents(self) -> List[Dict[str, Any]]:
+        """存储中的专利列表，修改须通过本类或存储的方法进行"""
+        return self.store.patents
+    
+    @property
+    def data_file(self) -> str:
+        """数据存储文件路径"""
+        return self.store.data_file
+    
+    @property
+    def log_file(self) -> str:
+        """操作日志文件路径"""
+        return self.store.log_file
     
     def _load_patents(self):
-        """从文件加载专利数据"""
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.patents = data.get('patents', [])
-                    print(f"✅ 已加载 {len(self.patents)} 个专利记录")
-            else:
-                print("📝 未找到历史数据文件，将创建新的数据存储")
-        except Exception as e:
-            print(f"⚠️ 加载专利数据失败: {str(e)}")
-            self.patents = []
+        """从磁盘重新加载专利数据"""
+        self.store._load_patents()
     
-    def _save_patents(self):
-        """保存专利数据到文件"""
-        try:
-            data = {
-                "patents": self.patents,
-                "last_updated": self._get_current_time(),
-                "total_count": len(self.patents)
-            }
-            
-            # 创建备份 - 在Windows中安全地处理文件操作
-            backup_file = f"{self.data_file}.backup"
-            if os.path.exists(self.data_file):
-                # 如果备份文件已存在，先删除它
-                if os.path.exists(backup_file):
-                    try:
-                        os.remove(backup_file)
-                    except OSError:
-                        pass  # 忽略删除失败的情况
-                
-                # 创建备份
-                try:
-                    import shutil
-                    shutil.copy2(self.data_file, backup_file)
-                except Exception as e:
-                    print(f"⚠️ 创建备份失败: {str(e)}")
-            
-            # 保存新数据
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+    def flush(self):
+        """立即写入所有尚未保存的修改，batched 和 manual 模式下需要持久化时调用"""
+        self.store.flush()
+    
+    def _cache_key(self, prompt: str, system_prompt: str, temperature: float) -> str:
+        """生成内容缓存键"""
+        return LLMCache.make_key(
+            base_url=self.client.base_url,
+            model=self.client.model,
+            system=system_prompt,
+            prompt=prompt,
+            temperature=round(temperature, 2)
+        )
+    
+    @staticmethod
+    def _cacheable(content: str) -> bool:
+        """错误结果不写入缓存"""
+        return not content.startswith("API 调用错误:") and content != "模型没有返回预期的内容"
+    
+    def _join_inflight(self, key: str) -> Tuple[concurrent.futures.Future, bool]:
+        """
+        登记进行中的请求，相同请求只由第一个调用方发出
+        
+        Args:
+            key: 请求的缓存键
             
-            print(f"💾 已保存 {len(self.patents)} 个专利记录")
+        Returns:
+            (请求结果的 Future, 当前调用方是否负责发出请求)
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = concurrent.futures.Future()
+            return future, True
+    
+    def _leave_inflight(self, key: str):
+        """请求完成后移除登记，之后的相同请求重新发出（或命中缓存）"""
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+    
+    def _cached_generate(self, prompt: str, system_prompt: str, temperature: float, cache: bool = False) -> str:
+        """
+        带持久化缓存的内容生成
+        
+        并发的相同请求（提示词、系统提示、温度和模型均相同）合并为一次 API 调用，
+        后到的调用方等待并共享第一个调用方的结果。
+        
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示
+            temperature: 生成温度
+            cache: 是否强制使用缓存；温度不高于 CACHE_TEMPERATURE 时总是使用
             
-        except Exception as e:
-            print(f"❌ 保存专利数据失败: {str(e)}")
-            # 如果保存失败，尝试恢复备份
-            backup_file = f"{self.data_file}.backup"
-            if os.path.exists(backup_file):
-                try:
-                    import shutil
-                    shutil.copy2(backup_file, self.data_file)
-                    print("🔄 已从备份恢复数据")
-                except Exception as restore_error:
-                    print(f"❌ 恢复备份失败: {str(restore_error)}")
+        Returns:
+            生成的文本内容
+        """
+        key = self._cache_key(prompt, system_prompt, temperature)
+        future, leader = self._join_inflight(key)
+        if not leader:
+            return future.result()
+        
+        try:
+            use_cache = cache or temperature <= self.CACHE_TEMPERATURE
+            content = self._cache.get(key) if use_cache else None
+            if content is None:
+                content = self.client.generate_content(prompt, system_prompt, temperature)
+                if use_cache and self._cacheable(content):
+                    self._cache.set(key, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave_inflight(key)
+    
+    async def _acached_generate(self, prompt: str, system_prompt: str, temperature: float, cache: bool = False) -> str:
+        """_cached_generate 的异步版本，与同步调用共享进行中的请求"""
+        key = self._cache_key(prompt, system_prompt, temperature)
+        future, leader = self._join_inflight(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        
+        try:
+            use_cache = cache or temperature <= self.CACHE_TEMPERATURE
+            content = self._cache.get(key) if use_cache else None
+            if content is None:
+                content = await self.client.agenerate_content(prompt, system_prompt, temperature)
+                if use_cache and self._cacheable(content):
+                    self._cache.set(key, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave_inflight(key)
     
     def generate_patent_ideas(
         self, 
         count: int = 5, 
         temperature: float = 0.8,
-        max_workers: int = 3
+        max_workers: Optional[int] = None,
+        rate_limit: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
-        批量生成专利创意（多线程）
+        批量生成专利创意（asyncio 协程并发）
+        
+        同步接口，内部通过 run_async 执行 agenerate_patent_ideas。
         
         Args:
             count: 生成数量
             temperature: 创意随机性
-            max_workers: 最大线程数
+            max_workers: 最大并发请求数，None 表示使用 max_concurrency
+            rate_limit: 每秒请求数上限，None 表示使用 requests_per_minute
             
         Returns:
             专利创意列表
         """
-        # 创建多个提示，每个提示生成一个创意
-        prompts = [self.templates.get_patent_idea_prompt() for _ in range(count)]
+        return run_async(self.agenerate_patent_ideas(count, temperature, max_workers, rate_limit))
+    
+    async def agenerate_patent_ideas(
+        self, 
+        count: int = 5, 
+        temperature: float = 0.8,
+        max_workers: Optional[int] = None,
+        rate_limit: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量生成专利创意的协程版本，参数与返回值同 generate_patent_ideas
+        """
+        # 提示词固定不变，只构建一次；每个请求生成一个创意
+        prompts = [self.templates.get_patent_idea_prompt()] * count
+        
+        if rate_limit is None and self.requests_per_minute:
+            rate_limit = self.requests_per_minute / 60
         
-        # 使用多线程批量生成
-        results = self.client.batch_generate_json(
+        results = await self.client.abatch_generate_json(
             prompts=prompts,
-            system_prompt="你是一位资深的专利专家，专门从事服务器技术领域的创新研究。请严格按照JSON格式返回结果。",
+            system_prompt=IDEA_SYSTEM_PROMPT,
             temperature=temperature,
-            max_workers=max_workers
+            max_workers=max_workers or self.max_concurrency,
+            rate_limit=rate_limit
         )
         
-        # 处理结果
+        return self._build_patent_ideas(results)
+    
+    def _build_patent_ideas(self, results: List[Any]) -> List[Dict[str, Any]]:
+        """将批量生成的 JSON 结果整理为专利创意列表，失败的结果转换为错误创意"""
         patent_ideas = []
+        # 结果已全部返回，整批共用同一个生成时间
+        now = self._get_current_time()
         for i, result in enumerate(results):
             if isinstance(result, dict) and "error" not in result:
                 # 验证必要字段
                 if "title" in result and "features" in result:
                     # 添加ID和生成时间
                     result["id"] = f"idea_{i+1}"
-                    result["generated_at"] = self._get_current_time()
+                    result["generated_at"] = now
                     patent_ideas.append(result)
                 else:
                     # 字段不完整
@@ -138,7 +344,7 @@ class PatentAssistant:
                         "title": result.get("title", f"创意 #{i+1}"),
                         "features": result.get("features", ["生成的内容格式不完整"]),
                         "error": "生成的JSON格式不完整",
-                        "generated_at": self._get_current_time()
+                        "generated_at": now
                     }
                     patent_ideas.append(error_idea)
             else:
@@ -154,7 +360,7 @@ class PatentAssistant:
                     "title": f"生成失败 #{i+1}",
                     "features": ["生成过程中出现错误"],
                     "error": error_message,
-                    "generated_at": self._get_current_time()
+                    "generated_at": now
                 }
                 patent_ideas.append(error_idea)
         
@@ -164,7 +370,8 @@ class PatentAssistant:
         self, 
         title: str, 
         features: List[str], 
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        cache: bool = False
     ) -> Dict[str, Any]:
         """
         生成完整专利文档
@@ -173,128 +380,172 @@ class PatentAssistant:
             title: 专利标题
             features: 专利特性列表
             temperature: 生成温度
+            cache: 是否复用相同标题、特性和温度的历史结果
             
         Returns:
             完整的专利文档
         """
         prompt = self.templates.get_full_patent_prompt(title, features)
         
-        result = self.client.generate_content(
+        result = self._cached_generate(
             prompt=prompt,
-            system_prompt="你是一位资深的专利撰写专家，具有20年的专利申请经验。请按照国际专利申请标准撰写完整的专利文档。",
+            system_prompt=PATENT_SYSTEM_PROMPT,
+            temperature=temperature,
+            cache=cache
+        )
+        
+        return self.add_patent(title, features, result)
+    
+    def stream_full_patent(
+        self, 
+        title: str, 
+        features: List[str], 
+        temperature: float = 0.7
+    ) -> Iterator[str]:
+        """
+        流式生成完整专利文档，不保存结果
+        
+        调用方拼接全部片段后，通过 add_patent 保存专利文档。
+        
+        Args:
+            title: 专利标题
+            features: 专利特性列表
+            temperature: 生成温度
+            
+        Yields:
+            专利内容文本片段
+        """
+        prompt = self.templates.get_full_patent_prompt(title, features)
+        
+        yield from self.client.generate_content_stream(
+            prompt=prompt,
+            system_prompt=PATENT_SYSTEM_PROMPT,
             temperature=temperature
         )
+    
+    def add_patent(self, title: str, features: List[str], content: str) -> Dict[str, Any]:
+        """
+        保存一份已生成的专利文档
         
+        Args:
+            title: 专利标题
+            features: 专利特性列表
+            content: 专利内容
+            
+        Returns:
+            完整的专利文档
+        """
         # 检查是否有错误
         status = "draft"
-        if result.startswith("API 调用错误:"):
+        if content.startswith("API 调用错误:"):
             status = "error"
         
         # 构建专利文档结构
         patent_doc = {
-            "id": f"patent_{int(datetime.now().timestamp())}_{len(self.patents) + 1}",
+            "id": f"patent_{int(datetime.now().timestamp())}_{len(self.store) + 1}",
             "title": title,
             "features": features,
-            "content": result,
+            "content": content,
             "generated_at": self._get_current_time(),
             "status": status
         }
         
-        # 线程安全地添加到专利列表并保存
-        with self._lock:
-            self.patents.append(patent_doc)
-            self._save_patents()
-        
+        self.store.add_patents([patent_doc])
         return patent_doc
     
     def batch_generate_patents(
         self,
         patent_ideas: List[Dict[str, Any]],
         temperature: float = 0.7,
-        max_workers: int = 2
+        max_workers: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        cache: bool = False,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
     ) -> List[Dict[str, Any]]:
         """
-        批量生成完整专利文档（多线程）
+        批量生成完整专利文档（asyncio 协程并发）
+        
+        同步接口，内部通过 run_async 执行 abatch_generate_patents；
+        on_result 在调用线程中按完成顺序回调，可用于实时更新进度。
         
         Args:
             patent_ideas: 专利创意列表
             temperature: 生成温度
-            max_workers: 最大线程数
+            max_workers: 最大并发请求数，None 表示使用 max_concurrency
+            rate_limit: 每秒请求数上限，None 表示使用共享的 requests_per_minute 限流
+            cache: 是否复用相同标题、特性和温度的历史结果
+            on_result: 每完成一个专利时调用，参数为 (创意下标, 专利文档)
             
         Returns:
-            完整专利文档列表
+            完整专利文档列表，顺序与 patent_ideas 一致
         """
-        def generate_single_patent(idea):
-            """生成单个专利的内部函数"""
-            if "error" in idea:
-                return {
-                    "id": idea["id"],
-                    "title": idea["title"],
-                    "features": idea.get("features", []),
-                    "content": f"无法生成专利内容：{idea['error']}",
-                    "generated_at": self._get_current_time(),
-                    "status": "error"
-                }
-            
-            title = idea.get("title", "未知标题")
-            features = idea.get("features", [])
-            
-            prompt = self.templates.get_full_patent_prompt(title, features)
-            
-            content = self.client.generate_content(
-                prompt=prompt,
-                system_prompt="你是一位资深的专利撰写专家，具有20年的专利申请经验。请按照国际专利申请标准撰写完整的专利文档。",
-                temperature=temperature
-            )
-            
-            return {
-                "id": idea["id"].replace("idea_", "patent_"),
-                "title": title,
-                "features": features,
-                "content": content,
-                "generated_at": self._get_current_time(),
-                "status": "draft"
-            }
-        
-        # 使用线程池并发生成专利
-        patents = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_idea = {
-                executor.submit(generate_single_patent, idea): i 
-                for i, idea in enumerate(patent_ideas)
-            }
+        return run_async(self.abatch_generate_patents(
+            patent_ideas, temperature, max_workers, rate_limit, cache, on_result
+        ))
+    
+    async def abatch_generate_patents(
+        self,
+        patent_ideas: List[Dict[str, Any]],
+        temperature: float = 0.7,
+        max_workers: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        cache: bool = False,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量生成完整专利文档（asyncio 协程并发）
+        
+        Args:
+            patent_ideas: 专利创意列表
+            temperature: 生成温度
+            max_workers: 最大并发请求数，None 表示使用 max_concurrency
+            rate_limit: 每秒请求数上限，None 表示使用共享的 requests_per_minute 限流
+            cache: 是否复用相同标题、特性和温度的历史结果
+            on_result: 每完成一个专利时调用，参数为 (创意下标, 专利文档)
             
-            # 按原始顺序收集结果
-            patents = [None] * len(patent_ideas)
-            for future in concurrent.futures.as_completed(future_to_idea):
-                index = future_to_idea[future]
-                try:
-                    result = future.result()
-                    patents[index] = result
-                except Exception as e:
-                    # 处理异常情况
-                    idea = patent_ideas[index]
-                    patents[index] = {
-                        "id": idea["id"].replace("idea_", "patent_"),
-                        "title": idea.get("title", "未知标题"),
-                        "features": idea.get("features", []),
-                        "content": f"生成专利时出现错误：{str(e)}",
-                        "generated_at": self._get_current_time(),
-                        "status": "error"
-                    }
+        Returns:
+            完整专利文档列表
+        """
+        semaphore = asyncio.Semaphore(max_workers or self.max_concurrency)
+        limiter = RateLimiter(rate_limit) if rate_limit else self._rate_limiter
+        
+        async def agenerate(prompt, system_prompt, temperature):
+            """在并发上限和速率限制内生成内容"""
+            async with semaphore:
+                if limiter:
+                    await limiter.aacquire()
+                return await self._acached_generate(prompt, system_prompt, temperature, cache=cache)
+        
+        async def generate_indexed(index, idea):
+            """生成单个专利并附带下标，异常转换为错误文档"""
+            try:
+                patent = await _agenerate_single_patent(
+                    agenerate, self.templates, idea,
+                    temperature, PATENT_SYSTEM_PROMPT, self._get_current_time
+                )
+            except Exception as e:
+                patent = _error_patent(idea, f"生成专利时出现错误：{str(e)}", self._get_current_time())
+            return index, patent
         
-        # 线程安全地添加到专利列表并保存
-        with self._lock:
-            self.patents.extend([p for p in patents if p is not None])
-            self._save_patents()
+        # 按完成顺序接收结果并回调，最终仍按原始顺序返回
+        patents = [None] * len(patent_ideas)
+        for next_done in asyncio.as_completed(
+            [generate_indexed(index, idea) for index, idea in enumerate(patent_ideas)]
+        ):
+            index, patent = await next_done
+            patents[index] = patent
+            if on_result:
+                on_result(index, patent)
         
+        self.store.add_patents(patents)
         return patents
     
     def optimize_patent(
         self, 
         patent_content: str, 
         optimization_focus: str = "全面优化",
-        temperature: float = 0.6
+        temperature: float = 0.6,
+        cache: bool = False
     ) -> str:
         """
         优化专利内容
@@ -303,71 +554,56 @@ class PatentAssistant:
             patent_content: 原始专利内容
             optimization_focus: 优化重点
             temperature: 生成温度
+            cache: 是否复用相同内容和优化重点的历史结果
             
         Returns:
             优化后的专利内容
         """
         prompt = self.templates.get_optimization_prompt(patent_content, optimization_focus)
         
-        return self.client.generate_content(
+        return self._cached_generate(
             prompt=prompt,
-            system_prompt="你是一位专利优化专家，擅长提升专利文档的质量和专业性。",
-            temperature=temperature
+            system_prompt=OPTIMIZATION_SYSTEM_PROMPT,
+            temperature=temperature,
+            cache=cache
         )
     
+    def storage_stat(self) -> Tuple[bool, int]:
+        """返回持久化数据的 (是否存在, 总字节数)，同时统计快照和日志文件"""
+        return self.store.storage_stat()
+    
+    @property
+    def revision(self) -> int:
+        """专利数据版本号，每次增删改或重新加载后递增，可作为跨会话共享缓存的键"""
+        return self.store.revision
+    
     def get_patents(self) -> List[Dict[str, Any]]:
         """获取所有专利文档"""
-        with self._lock:
-            return self.patents.copy()
+        return self.store.get_patents()
     
     def get_patent_by_id(self, patent_id: str) -> Optional[Dict[str, Any]]:
         """根据ID获取专利文档"""
-        with self._lock:
-            for patent in self.patents:
-                if patent["id"] == patent_id:
-                    return patent.copy()
-        return None
+        return self.store.get_patent_by_id(patent_id)
     
     def update_patent(self, patent_id: str, updates: Dict[str, Any]) -> bool:
         """更新专利文档"""
-        with self._lock:
-            for i, patent in enumerate(self.patents):
-                if patent["id"] == patent_id:
-                    self.patents[i].update(updates)
-                    self.patents[i]["updated_at"] = self._get_current_time()
-                    self._save_patents()
-                    return True
-        return False
+        return self.store.update_patent(patent_id, updates)
     
     def delete_patent(self, patent_id: str) -> bool:
         """删除专利文档"""
-        with self._lock:
-            for i, patent in enumerate(self.patents):
-                if patent["id"] == patent_id:
-                    del self.patents[i]
-                    self._save_patents()
-                    return True
-        return False
+        return self.store.delete_patent(patent_id)
     
     def export_patents_json(self) -> str:
         """导出专利为JSON格式"""
-        with self._lock:
-            return json.dumps(self.patents, ensure_ascii=False, indent=2)
+        return self.store.export_patents_json()
     
     def export_patents_text(self) -> str:
         """导出专利为文本格式"""
-        with self._lock:
-            text_content = []
-            for patent in self.patents:
-                text_content.append(f"专利标题：{patent['title']}")
-                text_content.append(f"专利ID：{patent['id']}")
-                text_content.append(f"生成时间：{patent['generated_at']}")
-                text_content.append(f"状态：{patent['status']}")
-                text_content.append("=" * 50)
-                text_content.append(patent['content'])
-                text_content.append("\n" + "=" * 80 + "\n")
-            
-            return "\n".join(text_content)
+        return self.store.export_patents_text()
+    
+    def iter_patents_text(self) -> Iterator[str]:
+        """逐个专利生成文本导出内容"""
+        return self.store.iter_patents_text()
     
     def _get_current_time(self) -> str:
         """获取当前时间字符串"""
@@ -375,14 +611,7 @@ class PatentAssistant:
     
     def get_statistics(self) -> Dict[str, Any]:
         """获取专利统计信息"""
-        with self._lock:
-            total = len(self.patents)
-            draft_count = sum(1 for p in self.patents if p.get("status") == "draft")
-            error_count = sum(1 for p in self.patents if p.get("status") == "error")
-            
-            return {
-                "total_patents": total,
-                "draft_patents": draft_count,
-                "error_patents": error_count,
-                "success_rate": (draft_count / total * 100) if total > 0 else 0
-            } 
\ No newline at end of file
+        stats = self.store.get_statistics()
+        stats["cache_hits"] = self._cache.hits
+        stats["cache_misses"] = self._cache.misses
+        return stats
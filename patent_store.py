@@ -0,0 +1,563 @@
+"""
+专利数据存储
+以 JSON 快照加追加写入的操作日志持久化专利文档，支持多线程并发读写
+"""
+
+import json
+import os
+import threading
+import time
+import atexit
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """将对象编码为 UTF-8 JSON 字节串，非 ASCII 字符原样保留"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0))
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def _json_loads(data: bytes) -> Any:
+    """解码 JSON 字节串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class RWLock:
+    """
+    读写锁：多个读者可并发持有，写者独占
+    
+    有写者等待时新的读者排队，避免持续的界面读取饿死批量生成的写入。
+    锁不可重入，持有读锁时不能再次获取读锁或写锁。
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read_lock(self):
+        """获取共享读锁"""
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write_lock(self):
+        """获取独占写锁"""
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+# 延迟保存模式的存储实例，进程退出前统一落盘
+_batched_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_batched_stores():
+    """进程退出时写入延迟保存模式下尚未落盘的修改"""
+    for store in list(_batched_stores):
+        store.flush()
+
+
+def _flush_loop(ref, dirty: threading.Event, delay: float):
+    """
+    后台保存线程：有修改时等待 delay 秒合并后续修改，再统一写入
+    
+    空闲时只持有存储的弱引用，并定期检查存储是否已被回收，回收后线程退出；
+    等待合并期间持有强引用，保证最后一批修改在回收前写入。
+    """
+    while True:
+        dirty.wait(60)
+        store = ref()
+        if store is None:
+            return
+        if dirty.is_set():
+            time.sleep(delay)
+            dirty.clear()
+            store.flush()
+        del store
+
+
+class PatentStore:
+    """
+    专利数据存储类，维护内存中的专利列表并持久化到快照和操作日志
+    
+    序号和快照内容只在本实例内维护，同一数据文件在进程内只能由一个实例读写；
+    多个助手（如不同模型）应共享同一个存储实例。
+    """
+    
+    # 保存模式：immediate 每次修改立即写入；batched 由后台线程合并短时间内的修改后写入；
+    # manual 只在调用 flush() 时写入
+    SAVE_MODES = ("immediate", "batched", "manual")
+    # batched 模式下合并修改的等待时间（秒）
+    SAVE_DELAY = 0.5
+    # 操作日志超过快照两倍大小（且至少为该值的两倍）时压缩
+    COMPACT_MIN_BYTES = 64 * 1024
+    
+    def __init__(self, data_file: str = "patents_data.json", save_mode: str = "immediate"):
+        """
+        初始化专利存储并加载已有数据
+        
+        Args:
+            data_file: 数据存储文件路径
+            save_mode: 保存模式，"immediate"、"batched" 或 "manual"
+        """
+        if save_mode not in self.SAVE_MODES:
+            raise ValueError(f"未知的保存模式: {save_mode}")
+        
+        self.data_file = data_file
+        # 操作日志：每次修改只追加一行，定期压缩进快照文件
+        self.log_file = os.path.splitext(data_file)[0] + ".jsonl"
+        self._seq = 0  # 最后一条操作记录的序号
+        self.patents = []  # 存储生成的专利
+        self._index: Dict[str, int] = {}  # 专利ID -> 在 self.patents 中的下标（ID 重复时为首个）
+        self._status_counts: Counter = Counter()  # 各状态的专利数量，随增删改增量维护
+        self._revision = 0  # 专利数据版本号，每次修改递增
+        self._export_cache: Dict[str, Tuple[int, str]] = {}  # 导出格式 -> (版本号, 导出内容)
+        self._lock = RWLock()  # 读写锁，保护专利列表和索引
+        self._io_lock = threading.RLock()  # 串行化日志和快照的文件写入
+        self._pending: List[bytes] = []  # 已编码、尚未写入日志的操作记录
+        # 保护待写队列的追加与整体取出；写者和落盘线程分别持有写锁和文件锁，互不排斥
+        self._pending_lock = threading.Lock()
+        
+        self.save_mode = save_mode
+        self._dirty = threading.Event()  # batched 模式下有待保存的修改
+        if save_mode == "batched":
+            threading.Thread(
+                target=_flush_loop,
+                args=(weakref.ref(self), self._dirty, self.SAVE_DELAY),
+                daemon=True
+            ).start()
+            _batched_stores.add(self)
+        
+        # 加载已有的专利数据
+        self._load_patents()
+    
+    def _load_patents(self):
+        """从快照文件加载专利数据，再重放操作日志中快照之后的记录"""
+        with self._io_lock, self._lock.write_lock():
+            self._load_patents_locked()
+    
+    def _load_patents_locked(self):
+        """加载专利数据（调用方需持有文件锁和写锁）"""
+        try:
+            # 先落盘尚未写入的记录，否则重新加载会丢失这些修改
+            self._write_pending()
+            
+            patents, last_seq = [], 0
+            snapshot_exists = os.path.exists(self.data_file)
+            if snapshot_exists:
+                with open(self.data_file, 'rb') as f:
+                    data = _json_loads(f.read())
+                    patents = data.get('patents', [])
+                    last_seq = data.get('last_seq', 0)
+            
+            self.patents = patents
+            self._rebuild_index()
+            replayed = self._replay_log(last_seq)
+            
+            if snapshot_exists or replayed:
+                print(f"✅ 已加载 {len(self.patents)} 个专利记录")
+            else:
+                print("📝 未找到历史数据文件，将创建新的数据存储")
+        except Exception as e:
+            print(f"⚠️ 加载专利数据失败: {str(e)}")
+            self.patents = []
+            self._index = {}
+            self._status_counts = Counter()
+            self._revision += 1
+    
+    def _rebuild_index(self):
+        """根据专利列表重建ID索引和状态计数"""
+        self._index = {}
+        for i, patent in enumerate(self.patents):
+            self._index.setdefault(patent["id"], i)
+        self._status_counts = Counter(p.get("status") for p in self.patents)
+        self._revision += 1
+    
+    def _append_patent(self, patent_doc: Dict[str, Any]):
+        """追加专利并登记索引（调用方需持有锁）"""
+        self._index.setdefault(patent_doc["id"], len(self.patents))
+        self.patents.append(patent_doc)
+        self._status_counts[patent_doc.get("status")] += 1
+        self._revision += 1
+    
+    def _extend_patents(self, patent_docs: List[Dict[str, Any]]):
+        """批量追加专利，列表只扩展一次（调用方需持有锁）"""
+        start = len(self.patents)
+        for offset, patent_doc in enumerate(patent_docs):
+            self._index.setdefault(patent_doc["id"], start + offset)
+        self.patents.extend(patent_docs)
+        self._status_counts.update(p.get("status") for p in patent_docs)
+        self._revision += 1
+    
+    def _remove_patent(self, i: int):
+        """
+        删除下标为 i 的专利（调用方需持有锁）
+        
+        用末尾元素填补空位，删除为 O(1)，但会改变末尾专利的位置。
+        """
+        patent_id = self.patents[i]["id"]
+        self._status_counts[self.patents[i].get("status")] -= 1
+        self._revision += 1
+        last = self.patents.pop()
+        if i != len(self.patents):
+            self.patents[i] = last
+            self._index[last["id"]] = min(self._index[last["id"]], i)
+        del self._index[patent_id]
+        
+        # 索引条目少于专利数说明存在重复ID，需找到剩余的同ID专利
+        if len(self._index) < len(self.patents):
+            for j, patent in enumerate(self.patents):
+                if patent["id"] == patent_id:
+                    self._index[patent_id] = j
+                    break
+    
+    def _update_patent(self, i: int, changes: Dict[str, Any]):
+        """更新下标为 i 的专利并同步状态计数（调用方需持有锁）"""
+        patent = self.patents[i]
+        if "status" in changes:
+            self._status_counts[patent.get("status")] -= 1
+            self._status_counts[changes["status"]] += 1
+        patent.update(changes)
+        self._revision += 1
+    
+    def _replay_log(self, last_seq: int) -> int:
+        """
+        将操作日志中序号大于 last_seq 的记录应用到 self.patents
+        
+        Args:
+            last_seq: 快照已包含的最后一条操作序号
+            
+        Returns:
+            重放的记录数
+        """
+        self._seq = last_seq
+        if not os.path.exists(self.log_file):
+            return 0
+        
+        replayed = 0
+        with open(self.log_file, 'rb+') as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = _json_loads(line)
+                except ValueError:
+                    # 进程中途退出留下的不完整记录，截断后新记录才能被重放
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                # 压缩后、清空日志前退出时，日志中会残留快照已包含的记录
+                if record["seq"] <= last_seq:
+                    continue
+                self._apply_op(record)
+                self._seq = record["seq"]
+                replayed += 1
+        return replayed
+    
+    def _apply_op(self, record: Dict[str, Any]):
+        """将一条操作记录应用到专利列表"""
+        op = record["op"]
+        if op == "add":
+            self._append_patent(record["doc"])
+            return
+        
+        i = self._index.get(record["id"])
+        if i is None:
+            return
+        if op == "update":
+            self._update_patent(i, record["changes"])
+        elif op == "delete":
+            self._remove_patent(i)
+    
+    def _log_ops(self, records: Iterable[Dict[str, Any]]):
+        """
+        为操作记录分配序号并放入待写队列（调用方需持有写锁）
+        
+        只做编码，不做文件 I/O；释放写锁后再调用 _flush_log 写入磁盘，
+        写入期间读者不会被阻塞。
+        
+        Args:
+            records: 操作记录，如 {"op": "add", "doc": {...}}、
+                {"op": "update", "id": ..., "changes": {...}}、{"op": "delete", "id": ...}
+        """
+        lines = []
+        for record in records:
+            self._seq += 1
+            lines.append(_json_dumps({"seq": self._seq, **record}) + b"\n")
+        # 写锁保证各写者按序号顺序入队
+        with self._pending_lock:
+            self._pending.extend(lines)
+    
+    def _flush_log(self):
+        """
+        将待写的操作记录追加到日志文件（调用方不能持有读写锁）
+        
+        每次只写入变化的部分；日志超过快照的两倍大小时压缩为新快照。
+        """
+        with self._io_lock:
+            try:
+                if not self._write_pending():
+                    return
+                
+                print(f"💾 已保存 {len(self.patents)} 个专利记录")
+                
+                snapshot_size = os.path.getsize(self.data_file) if os.path.exists(self.data_file) else 0
+                if os.path.getsize(self.log_file) > 2 * max(snapshot_size, self.COMPACT_MIN_BYTES):
+                    self._save_patents()
+            except Exception as e:
+                print(f"❌ 保存专利数据失败: {str(e)}")
+    
+    def _persist(self):
+        """按保存模式处理写锁释放后的落盘（调用方不能持有读写锁）"""
+        if self.save_mode == "immediate":
+            self._flush_log()
+        elif self.save_mode == "batched":
+            self._dirty.set()
+    
+    def flush(self):
+        """立即写入所有尚未保存的修改，batched 和 manual 模式下需要持久化时调用"""
+        self._flush_log()
+    
+    def __del__(self):
+        # batched 模式下实例可能在后台线程合并等待期间被回收，回收前写入剩余修改，
+        # 并唤醒后台线程使其退出
+        if getattr(self, "save_mode", None) == "batched":
+            if self._pending:
+                self._flush_log()
+            self._dirty.set()
+    
+    def _write_pending(self) -> bool:
+        """
+        将待写队列整体追加到日志文件（调用方需持有文件锁）
+        
+        Returns:
+            是否写入了记录
+        """
+        # 队列按序号追加，整体取出写入可保持日志顺序
+        with self._pending_lock:
+            lines, self._pending = self._pending, []
+        if not lines:
+            return False
+        
+        with open(self.log_file, 'ab') as f:
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+    
+    def _save_patents(self):
+        """将全部专利写入新快照并清空操作日志（调用方不能持有读写锁）"""
+        with self._io_lock:
+            try:
+                # 待写记录的序号不大于快照的 last_seq，清空日志后再写入时重放会跳过
+                with self._lock.read_lock():
+                    count = len(self.patents)
+                    payload = _json_dumps({
+                        "patents": self.patents,
+                        "last_updated": self._get_current_time(),
+                        "total_count": count,
+                        "last_seq": self._seq
+                    }, indent=True)
+                
+                # 先写临时文件并落盘再原子替换，任何时刻断电都只会留下完整的新快照或旧快照
+                tmp_file = f"{self.data_file}.tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                
+                # 旧快照通过硬链接保留为备份，无需复制文件内容
+                if os.path.exists(self.data_file):
+                    backup_file = f"{self.data_file}.backup"
+                    try:
+                        if os.path.exists(backup_file):
+                            os.remove(backup_file)
+                        os.link(self.data_file, backup_file)
+                    except OSError as e:
+                        print(f"⚠️ 创建备份失败: {str(e)}")
+                
+                os.replace(tmp_file, self.data_file)
+                
+                # 快照已包含日志中的全部操作，清空日志
+                open(self.log_file, 'w').close()
+                
+                print(f"💾 已保存 {count} 个专利记录")
+                
+            except Exception as e:
+                print(f"❌ 保存专利数据失败: {str(e)}")
+    
+    def __len__(self) -> int:
+        """当前专利数量"""
+        return len(self.patents)
+    
+    def add_patents(self, patent_docs: List[Dict[str, Any]]):
+        """
+        按顺序追加专利文档并按保存模式落盘
+        
+        Args:
+            patent_docs: 完整的专利文档列表
+        """
+        with self._lock.write_lock():
+            self._extend_patents(patent_docs)
+            self._log_ops({"op": "add", "doc": doc} for doc in patent_docs)
+        self._persist()
+    
+    def storage_stat(self) -> Tuple[bool, int]:
+        """
+        返回持久化数据的 (是否存在, 总字节数)
+        
+        修改先追加到操作日志，压缩时才重写快照，因此同时统计快照和日志文件。
+        """
+        exists, size = False, 0
+        for path in (self.data_file, self.log_file):
+            try:
+                size += os.stat(path).st_size
+                exists = True
+            except OSError:
+                pass
+        return exists, size
+    
+    @property
+    def revision(self) -> int:
+        """专利数据版本号，每次增删改或重新加载后递增，可作为跨会话共享缓存的键"""
+        return self._revision
+    
+    def get_patents(self) -> List[Dict[str, Any]]:
+        """获取所有专利文档"""
+        with self._lock.read_lock():
+            return self.patents.copy()
+    
+    def get_patent_by_id(self, patent_id: str) -> Optional[Dict[str, Any]]:
+        """根据ID获取专利文档"""
+        with self._lock.read_lock():
+            i = self._index.get(patent_id)
+            if i is not None:
+                return self.patents[i].copy()
+        return None
+    
+    def update_patent(self, patent_id: str, updates: Dict[str, Any]) -> bool:
+        """更新专利文档"""
+        with self._lock.write_lock():
+            i = self._index.get(patent_id)
+            if i is None:
+                return False
+            # ID 由索引维护，不允许通过更新修改
+            changes = {k: v for k, v in updates.items() if k != "id"}
+            changes["updated_at"] = self._get_current_time()
+            self._update_patent(i, changes)
+            self._log_ops([{"op": "update", "id": patent_id, "changes": changes}])
+        self._persist()
+        return True
+    
+    def delete_patent(self, patent_id: str) -> bool:
+        """删除专利文档"""
+        with self._lock.write_lock():
+            i = self._index.get(patent_id)
+            if i is None:
+                return False
+            self._remove_patent(i)
+            self._log_ops([{"op": "delete", "id": patent_id}])
+        self._persist()
+        return True
+    
+    def export_patents_json(self) -> str:
+        """导出专利为JSON格式，数据未变化时直接返回上次的结果"""
+        with self._lock.read_lock():
+            revision = self._revision
+            cached = self._export_cache.get("json")
+            if cached is not None and cached[0] == revision:
+                return cached[1]
+            content = _json_dumps(self.patents, indent=True).decode('utf-8')
+        
+        self._export_cache["json"] = (revision, content)
+        return content
+    
+    def export_patents_text(self) -> str:
+        """导出专利为文本格式，数据未变化时直接返回上次的结果"""
+        # 版本号先于内容读取，缓存内容不会比对应的版本号旧
+        revision = self._revision
+        cached = self._export_cache.get("text")
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        
+        content = "".join(self.iter_patents_text())
+        self._export_cache["text"] = (revision, content)
+        return content
+    
+    def iter_patents_text(self) -> Iterator[str]:
+        """
+        逐个专利生成文本导出内容，拼接结果与 export_patents_text 相同
+        
+        只在读锁内复制专利列表，格式化在锁外进行。
+        
+        Yields:
+            单个专利的文本块
+        """
+        with self._lock.read_lock():
+            snapshot = list(self.patents)
+        
+        separator = ""
+        for patent in snapshot:
+            yield (
+                f"{separator}专利标题：{patent['title']}\n"
+                f"专利ID：{patent['id']}\n"
+                f"生成时间：{patent['generated_at']}\n"
+                f"状态：{patent['status']}\n"
+                f"{'=' * 50}\n"
+                f"{patent['content']}\n"
+                f"\n{'=' * 80}\n"
+            )
+            separator = "\n"
+    
+    def _get_current_time(self) -> str:
+        """获取当前时间字符串"""
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取专利统计信息"""
+        with self._lock.read_lock():
+            total = len(self.patents)
+            draft_count = self._status_counts["draft"]
+            error_count = self._status_counts["error"]
+            
+            return {
+                "total_patents": total,
+                "draft_patents": draft_count,
+                "error_patents": error_count,
+                "success_rate": (draft_count / total * 100) if total > 0 else 0
+            }
@@ -5,13 +5,36 @@
 import subprocess
 import sys
 import os
+import hashlib
+
+# 记录上次成功安装时的依赖指纹，未变化时跳过 pip
+REQUIREMENTS_HASH_FILE = ".requirements.hash"
+
+
+def _requirements_hash():
+    """计算 requirements.txt 与当前解释器的指纹，换用其他虚拟环境时会重新安装"""
+    with open("requirements.txt", "rb") as f:
+        content = f.read()
+    return hashlib.sha256(sys.executable.encode("utf-8") + b"\0" + content).hexdigest()
 
 
 def install_requirements():
     """安装依赖"""
+    current = _requirements_hash()
+    if os.path.exists(REQUIREMENTS_HASH_FILE):
+        with open(REQUIREMENTS_HASH_FILE, "r", encoding="utf-8") as f:
+            if f.read().strip() == current:
+                print("✅ 依赖未变化，跳过安装")
+                return True
+    
     print("正在安装依赖...")
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        subprocess.check_call([
+            sys.executable, "-m", "pip", "install", "-r", "requirements.txt",
+            "--disable-pip-version-check", "--no-input"
+        ])
+        with open(REQUIREMENTS_HASH_FILE, "w", encoding="utf-8") as f:
+            f.write(current)
         print("✅ 依赖安装完成")
         return True
     except subprocess.CalledProcessError as e:
@@ -0,0 +1,168 @@
+"""
+PatentAssistant / PatentStore 持久化回归测试
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from patent_assistant import PatentAssistant
+from patent_store import PatentStore
+
+
+class ConcurrentWriteTest(unittest.TestCase):
+    """并发写入时操作日志不能丢失记录"""
+    
+    def setUp(self):
+        # 缩短线程切换间隔，放大竞争窗口
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+    
+    def tearDown(self):
+        sys.setswitchinterval(self._switch_interval)
+    
+    def test_concurrent_add_patent_keeps_every_record(self):
+        threads_count, per_thread = 8, 100
+        with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+            data_file = os.path.join(tmp_dir, "patents.json")
+            assistant = PatentAssistant("test-key", data_file=data_file)
+            assistant.store.COMPACT_MIN_BYTES = float("inf")  # 关闭压缩，只检查日志
+            
+            def writer(n):
+                for i in range(per_thread):
+                    assistant.add_patent(f"专利 {n}-{i}", ["特性"], "内容" * 2000)
+            
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assistant.flush()
+            
+            with open(assistant.log_file, "rb") as f:
+                seqs = [json.loads(line)["seq"] for line in f]
+            total = threads_count * per_thread
+            self.assertEqual(seqs, list(range(1, total + 1)))
+            
+            reloaded = PatentAssistant("test-key", data_file=data_file)
+            self.assertEqual(len(reloaded.patents), total)
+
+
+def _doc(patent_id, title, status="draft"):
+    """构造测试用专利文档"""
+    return {
+        "id": patent_id,
+        "title": title,
+        "features": ["特性"],
+        "content": f"{title} 的内容",
+        "generated_at": "2024-01-01 00:00:00",
+        "status": status
+    }
+
+
+class OpLogTest(unittest.TestCase):
+    """快照加操作日志的持久化与重放"""
+    
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self._tmp_dir.name, "patents.json")
+        self._stdout = contextlib.redirect_stdout(io.StringIO())
+        self._stdout.__enter__()
+    
+    def tearDown(self):
+        self._stdout.__exit__(None, None, None)
+        self._tmp_dir.cleanup()
+    
+    def _store(self, compact_min_bytes=float("inf")):
+        store = PatentStore(self.data_file)
+        store.COMPACT_MIN_BYTES = compact_min_bytes
+        return store
+    
+    def _apply_edits(self, store):
+        store.add_patents([_doc("p1", "一"), _doc("p2", "二"), _doc("p3", "三")])
+        store.update_patent("p2", {"title": "二改", "status": "error"})
+        store.delete_patent("p1")
+        store.add_patents([_doc("p4", "四")])
+    
+    def assertReloads(self, store):
+        reloaded = self._store()
+        self.assertEqual(reloaded.get_patents(), store.get_patents())
+        self.assertEqual(reloaded.get_statistics(), store.get_statistics())
+        return reloaded
+    
+    def test_reload_replays_log_without_compaction(self):
+        store = self._store()
+        self._apply_edits(store)
+        self.assertFalse(os.path.exists(self.data_file))
+        reloaded = self.assertReloads(store)
+        self.assertEqual([p["id"] for p in reloaded.get_patents()], ["p3", "p2", "p4"])
+        self.assertEqual(reloaded.get_patent_by_id("p2")["title"], "二改")
+    
+    def test_reload_after_compaction(self):
+        # 阈值为 0 时首次写入即压缩，之后日志超过快照两倍时再次压缩
+        store = self._store(compact_min_bytes=0)
+        self._apply_edits(store)
+        with open(self.data_file, "rb") as f:
+            self.assertGreater(json.loads(f.read())["last_seq"], 0)
+        self.assertReloads(store)
+    
+    def test_reload_with_snapshot_and_log_tail(self):
+        store = self._store()
+        self._apply_edits(store)
+        store._save_patents()
+        store.update_patent("p3", {"status": "error"})
+        store.delete_patent("p4")
+        self.assertGreater(os.path.getsize(store.log_file), 0)
+        self.assertReloads(store)
+    
+    def test_torn_trailing_line_is_truncated(self):
+        store = self._store()
+        self._apply_edits(store)
+        with open(store.log_file, "ab") as f:
+            f.write(b'{"seq": 99, "op": "add", "doc": {"id"')
+        
+        reloaded = self.assertReloads(store)
+        # 截断后追加的新记录在下次加载时能被重放
+        reloaded.add_patents([_doc("p5", "五")])
+        self.assertEqual(self._store().get_patents(), reloaded.get_patents())
+    
+    def test_crash_between_snapshot_replace_and_log_truncation(self):
+        store = self._store()
+        self._apply_edits(store)
+        with open(store.log_file, "rb") as f:
+            stale_log = f.read()
+        store._save_patents()
+        # 模拟替换快照后、清空日志前退出：日志仍保留快照已包含的记录
+        with open(store.log_file, "wb") as f:
+            f.write(stale_log)
+        
+        reloaded = self.assertReloads(store)
+        reloaded.add_patents([_doc("p5", "五")])
+        reloaded.delete_patent("p3")
+        self.assertEqual(self._store().get_patents(), reloaded.get_patents())
+    
+    def test_swap_delete_with_duplicate_ids(self):
+        store = self._store()
+        store.add_patents([_doc("a", "甲1"), _doc("b", "乙"), _doc("a", "甲2"), _doc("c", "丙")])
+        
+        self.assertTrue(store.delete_patent("a"))
+        # 末尾专利填补空位，索引指向剩余的同ID专利
+        self.assertEqual([p["title"] for p in store.get_patents()], ["丙", "乙", "甲2"])
+        self.assertEqual(store.get_patent_by_id("a")["title"], "甲2")
+        self.assertEqual(store.get_patent_by_id("c")["title"], "丙")
+        self.assertReloads(store)
+        
+        self.assertTrue(store.delete_patent("a"))
+        self.assertIsNone(store.get_patent_by_id("a"))
+        self.assertFalse(store.delete_patent("a"))
+        self.assertEqual(store.get_statistics()["total_patents"], 2)
+        self.assertReloads(store)
+
+
+if __name__ == "__main__":
+    unittest.main()